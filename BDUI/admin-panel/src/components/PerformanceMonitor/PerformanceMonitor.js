@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Card, Progress, Typography, Space } from 'antd';
 import { ThunderboltOutlined, CheckCircleOutlined, LoadingOutlined } from '@ant-design/icons';
+import { useApi } from '../../contexts/ApiContext';
 import './PerformanceMonitor.css';
 
 const { Text, Title } = Typography;
@@ -9,13 +10,18 @@ const STAGES = [
   { key: 'broadcast', label: 'Передача', icon: '📡', color: '#722ed1' }
 ];
 
+// Сколько семейств ключей кэша показывать (по числу обращений)
+const CACHE_NAMESPACES_LIMIT = 5;
+
 const PerformanceMonitor = ({ isUpdating, metrics, onComplete }) => {
+  const { performance } = useApi();
   const [currentStage, setCurrentStage] = useState(0);
   const [elapsedTime, setElapsedTime] = useState(0);
   const [stageTimings, setStageTimings] = useState({});
   const [startTime, setStartTime] = useState(null);
   const [isComplete, setIsComplete] = useState(false);
   const [hasRealMetrics, setHasRealMetrics] = useState(false);
+  const [cacheStats, setCacheStats] = useState(null);
 
   useEffect(() => {
     if (isUpdating && !startTime && !isComplete) {
@@ -84,12 +90,26 @@ const PerformanceMonitor = ({ isUpdating, metrics, onComplete }) => {
     }
   }, [metrics, isComplete, onComplete]);
 
+  useEffect(() => {
+    if (!isComplete) return;
+
+    performance.getCacheStats()
+      .then((response) => setCacheStats(response.data))
+      .catch((error) => console.error('Error loading cache stats:', error));
+  }, [isComplete, performance]);
+
   if (!isUpdating && currentStage === 0 && !isComplete) {
     return null;
   }
 
   const totalTime = metrics?.total || elapsedTime;
 
+  const cacheNamespaces = cacheStats
+    ? Object.entries(cacheStats.namespaces || {})
+        .sort(([, a], [, b]) => (b.hits + b.misses) - (a.hits + a.misses))
+        .slice(0, CACHE_NAMESPACES_LIMIT)
+    : [];
+
   return (
     <Card 
       className="performance-monitor"
@@ -138,6 +158,27 @@ const PerformanceMonitor = ({ isUpdating, metrics, onComplete }) => {
             </Text>
           </div>
         )}
+
+        {/* Статистика кэша воркера */}
+        {isComplete && cacheNamespaces.length > 0 && (
+          <div style={{ 
+            background: 'rgba(255,255,255,0.2)', 
+            padding: 12, 
+            borderRadius: 8 
+          }}>
+            <Text strong style={{ color: 'white', display: 'block', marginBottom: 4 }}>
+              Кэш (сжатие x{cacheStats.compression?.ratio ?? 1})
+            </Text>
+            {cacheNamespaces.map(([namespace, stats]) => (
+              <div key={namespace} style={{ display: 'flex', justifyContent: 'space-between' }}>
+                <Text style={{ color: 'white', fontSize: 12 }}>{namespace}</Text>
+                <Text style={{ color: 'white', fontSize: 12 }}>
+                  {(stats.hit_rate * 100).toFixed(0)}% hit · p95 {stats.get_latency.p95_ms ?? '>250'}ms · {stats.errors} err
+                </Text>
+              </div>
+            ))}
+          </div>
+        )}
       </Space>
     </Card>
   );
@@ -74,6 +74,10 @@ export const ApiProvider = ({ children }) => {
     getCategories: () => api.get('/api/templates/categories/list'),
   };
 
+  const performanceApi = {
+    getCacheStats: () => api.get('/api/performance/cache'),
+  };
+
   return (
     <ApiContext.Provider value={{
       screens: screensApi,
@@ -81,6 +85,7 @@ export const ApiProvider = ({ children }) => {
       analytics: analyticsApi,
       abTesting: abTestingApi,
       templates: templatesApi,
+      performance: performanceApi,
     }}>
       {children}
     </ApiContext.Provider>
@@ -6,14 +6,17 @@ import { useApi } from '../../contexts/ApiContext';
 
 const { Option } = Select;
 
+// Список грузится без config экранов, следующие страницы - по мере листания
+const SCREENS_PAGE_SIZE = 100;
+
 const ScreenList = () => {
   const [screens, setScreens] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [modalVisible, setModalVisible] = useState(false);
   const [pagination, setPagination] = useState({
     current: 1,
-    pageSize: 10,
-    total: 0
+    pageSize: 10
   });
   const [form] = Form.useForm();
   const navigate = useNavigate();
@@ -26,11 +29,15 @@ const ScreenList = () => {
   const fetchScreens = async () => {
     try {
       setLoading(true);
-      const response = await api.screens.getAll();
-      setScreens(response.data);
+      const response = await api.screens.getAll({
+        fields: 'summary',
+        limit: SCREENS_PAGE_SIZE
+      });
+      setScreens(response.data.items);
+      setNextCursor(response.data.next_cursor);
       setPagination(prev => ({
         ...prev,
-        total: response.data.length
+        current: 1
       }));
     } catch (error) {
       message.error('Ошибка загрузки экранов');
@@ -40,6 +47,33 @@ const ScreenList = () => {
     }
   };
 
+  const loadScreensUntil = async (count) => {
+    if (screens.length >= count || !nextCursor) {
+      return;
+    }
+    try {
+      setLoading(true);
+      let loaded = screens;
+      let cursor = nextCursor;
+      while (loaded.length < count && cursor) {
+        const response = await api.screens.getAll({
+          fields: 'summary',
+          limit: SCREENS_PAGE_SIZE,
+          cursor
+        });
+        loaded = [...loaded, ...response.data.items];
+        cursor = response.data.next_cursor;
+      }
+      setScreens(loaded);
+      setNextCursor(cursor);
+    } catch (error) {
+      message.error('Ошибка загрузки экранов');
+      console.error('Error fetching screens:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleCreate = async (values) => {
     try {
       await api.screens.create({
@@ -79,8 +113,9 @@ const ScreenList = () => {
     }
   };
 
-  const handleTableChange = (paginationConfig) => {
-    setPagination(paginationConfig);
+  const handleTableChange = (current, pageSize) => {
+    setPagination({ current, pageSize });
+    loadScreensUntil(current * pageSize);
   };
 
   const columns = [
@@ -190,10 +225,12 @@ const ScreenList = () => {
         loading={loading}
         pagination={{
           ...pagination,
+          // Общее число экранов неизвестно, пока есть курсор: открываем следующую страницу
+          total: screens.length + (nextCursor ? pagination.pageSize : 0),
           showSizeChanger: true,
           showQuickJumper: true,
           showTotal: (total, range) => 
-            `${range[0]}-${range[1]} из ${total} экранов`,
+            `${range[0]}-${range[1]} из ${nextCursor ? `${screens.length}+` : total} экранов`,
           pageSizeOptions: ['10', '20', '50', '100'],
           onChange: handleTableChange,
           onShowSizeChange: handleTableChange,
@@ -1,49 +1,834 @@
-import redis
-import json
+import redis.asyncio as aioredis
+import asyncio
+import orjson
 import os
-from typing import Any, Optional
+import time
+import zlib
+import fnmatch
+import inspect
+import uuid
+from collections import OrderedDict
+from cache_metrics import CacheMetrics
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+# Пул соединений и таймауты асинхронного клиента Redis
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1"))
+# Таймаут одной операции кэша, включая ожидание свободного соединения в пуле
+CACHE_OP_TIMEOUT = float(os.getenv("CACHE_OP_TIMEOUT", "0.25"))
+
+# Локальный (L1) кэш в памяти воркера перед Redis. Включается явно: до CACHE_L1_TTL
+# воркер может отдавать устаревшее значение, если до него не дошла инвалидация по pub/sub
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "false").lower() == "true"
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+# Максимальное время жизни записи L1: даже если сообщение об инвалидации
+# потерялось, устаревшее значение не проживет дольше этого срока
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "5"))
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "bdui:cache:invalidate")
+# Как долго воркер доверяет локально запомненному поколению пространства ключей
+CACHE_GENERATION_TTL = float(os.getenv("CACHE_GENERATION_TTL", "1"))
+GENERATION_KEY_PREFIX = "cache_gen:"
+# Время последней "мягкой" инвалидации пространства ключей (см. invalidate_namespace)
+TOUCH_KEY_PREFIX = "cache_touch:"
+# Блокировка на пересчет значения, общая для всех воркеров
+CACHE_LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "5"))
+CACHE_LOCK_POLL_INTERVAL = float(os.getenv("CACHE_LOCK_POLL_INTERVAL", "0.05"))
+LOCK_KEY_PREFIX = "cache_lock:"
+
+# Значения в Redis самоописываемые: JSON хранится как есть, а служебные форматы
+# начинаются с управляющего байта, с которого JSON-документ начаться не может.
+# Байтовые значения (например, готовые тела ответов) хранятся с RAW_HEADER,
+# сжатые - с ZLIB_HEADER поверх любого из двух форматов
+RAW_HEADER = b"\x01"
+ZLIB_HEADER = b"\x02"
+# Значения больше порога сжимаются быстрым уровнем zlib
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "2048"))
+CACHE_COMPRESS_LEVEL = int(os.getenv("CACHE_COMPRESS_LEVEL", "1"))
+# Сколько байт читать из Redis для начала сжатой записи (заголовки zlib/Huffman)
+CACHE_PREFIX_READ_BYTES = 512
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+redis_pool = aioredis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=CACHE_OP_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
+redis_client = aioredis.Redis(connection_pool=redis_pool)
+
+# Предохранитель: после N ошибок подряд кэш перестает ходить в Redis на время остывания
+CACHE_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CACHE_BREAKER_FAILURE_THRESHOLD", "5"))
+CACHE_BREAKER_COOLDOWN = float(os.getenv("CACHE_BREAKER_COOLDOWN", "10"))
+
+
+class CacheUnavailable(Exception):
+    """Redis пропущен, потому что предохранитель разомкнут"""
+
+
+class CircuitBreaker:
+    """Предохранитель вокруг клиента Redis.
+
+    closed - команды идут в Redis; open - команды сразу отклоняются до конца
+    остывания; half_open - пропускается одна пробная команда, ее результат
+    замыкает или снова размыкает предохранитель.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected_calls = 0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected_calls += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self._state = self.CLOSED
+
+    def record_cancelled(self):
+        # Отмена запроса ничего не говорит о здоровье Redis - отпускаем пробу
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        probe_failed = self._probe_in_flight
+        self._probe_in_flight = False
+        if probe_failed or (
+            self._state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            if self._state == self.CLOSED:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected_calls,
+            "failure_threshold": self.failure_threshold,
+            "cooldown": self.cooldown,
+        }
+
+
+circuit_breaker = CircuitBreaker(CACHE_BREAKER_FAILURE_THRESHOLD, CACHE_BREAKER_COOLDOWN)
+
+
+class LocalCache:
+    """LRU-кэш в памяти процесса, ограниченный по числу записей и TTL.
+
+    Значения хранятся уже разобранными, поэтому вызывающий код не должен их изменять.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def delete_pattern(self, pattern: str):
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
 
 
 class Cache:
-    @staticmethod
-    async def get(key: str) -> Optional[Any]:
+    """Кэш поверх Redis.
+
+    Ключи вида ``<namespace>:<rest>`` физически хранятся как ``<namespace>:v<generation>:<rest>``.
+    Инвалидация пространства ключей - это один INCR счетчика поколения,
+    а записи старого поколения просто доживают до своего TTL.
+    """
+
+    def __init__(self, local: Optional[LocalCache] = None):
+        self.local = local
+        # namespace -> (поколение, время мягкой инвалидации, до какого момента доверяем)
+        self._namespaces: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: set = set()
+        self._background: set = set()
+        self._listener: Optional[asyncio.Task] = None
+        self._handlers: List[Callable[[Optional[dict]], None]] = []
+        self.metrics = CacheMetrics()
+
+    async def get(self, key: str) -> Optional[Any]:
+        metrics = self.metrics.namespace(key)
+        started = time.perf_counter()
+        key = await self._physical_key(key)
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                metrics.hits += 1
+                metrics.l1_hits += 1
+                metrics.get_latency.observe((time.perf_counter() - started) * 1000)
+                return value
         try:
-            value = redis_client.get(key)
-            return json.loads(value) if value else None
+            data = await _call(redis_client.get(key))
+            value = _decode(data) if data else None
         except Exception:
+            metrics.errors += 1
+            metrics.misses += 1
             return None
-    
-    @staticmethod
-    async def set(key: str, value: Any, ttl: int = 3600):
+        metrics.get_latency.observe((time.perf_counter() - started) * 1000)
+        if value is None:
+            metrics.misses += 1
+            return None
+        metrics.hits += 1
+        metrics.bytes_read += len(data)
+        if self.local is not None:
+            self.local.set(key, value)
+        return value
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Читает несколько ключей одним MGET; возвращает только найденные"""
+        keys = list(keys)
+        physical_keys = await self._physical_keys(keys)
+        result = {}
+        missing = []
+        for key, physical_key in zip(keys, physical_keys):
+            value = self.local.get(physical_key) if self.local is not None else None
+            if value is not None:
+                metrics = self.metrics.namespace(key)
+                metrics.hits += 1
+                metrics.l1_hits += 1
+                result[key] = value
+            else:
+                missing.append((key, physical_key))
+        if not missing:
+            return result
         try:
-            redis_client.setex(key, ttl, json.dumps(value))
+            values = await _call(redis_client.mget([physical_key for _, physical_key in missing]))
         except Exception:
-            pass
-    
-    @staticmethod
-    async def delete(key: str):
+            for key, _ in missing:
+                metrics = self.metrics.namespace(key)
+                metrics.errors += 1
+                metrics.misses += 1
+            return result
+        for (key, physical_key), data in zip(missing, values):
+            metrics = self.metrics.namespace(key)
+            try:
+                value = _decode(data) if data else None
+            except Exception:
+                metrics.errors += 1
+                value = None
+            if value is None:
+                metrics.misses += 1
+                continue
+            metrics.hits += 1
+            metrics.bytes_read += len(data)
+            result[key] = value
+            if self.local is not None:
+                self.local.set(physical_key, value)
+        return result
+
+    async def get_prefix(self, key: str, length: int) -> Optional[bytes]:
+        """Первые ``length`` байт записи с сырыми байтами, без чтения всего значения.
+
+        Сжатая запись распаковывается потоково только до нужной длины. None, если
+        записи нет, она не из байтов или прочитанного куска не хватило.
+        """
+        metrics = self.metrics.namespace(key)
+        key = await self._physical_key(key)
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return bytes(value[:length]) if isinstance(value, (bytes, bytearray)) else None
         try:
-            redis_client.delete(key)
+            data = await _call(redis_client.getrange(key, 0, max(length, CACHE_PREFIX_READ_BYTES)))
+        except Exception:
+            metrics.errors += 1
+            return None
+        metrics.bytes_read += len(data)
+        if data[:1] == ZLIB_HEADER:
+            try:
+                data = zlib.decompressobj().decompress(data[1:], length + 1)
+            except zlib.error:
+                return None
+        if data[:1] != RAW_HEADER:
+            return None
+        return data[1:length + 1]
+
+    async def set(self, key: str, value: Any, ttl: int = 3600):
+        await self._set_physical(await self._physical_key(key), value, ttl)
+
+    async def _set_physical(self, physical_key: str, value: Any, ttl: int, local_ttl: Optional[float] = None):
+        metrics = self.metrics.namespace(physical_key)
+        started = time.perf_counter()
+        try:
+            data = _encode(value)
+            await _call(redis_client.setex(physical_key, ttl, data))
+        except Exception:
+            metrics.errors += 1
+            return
+        metrics.set_latency.observe((time.perf_counter() - started) * 1000)
+        metrics.bytes_written += len(data)
+        if self.local is not None:
+            self.local.set(physical_key, value, ttl if local_ttl is None else min(ttl, local_ttl))
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = 3600):
+        """Записывает несколько ключей одним конвейером (pipeline)"""
+        keys = list(items)
+        physical_keys = await self._physical_keys(keys)
+        started = time.perf_counter()
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, physical_key in zip(keys, physical_keys):
+                    data = _encode(items[key])
+                    self.metrics.namespace(key).bytes_written += len(data)
+                    pipe.setex(physical_key, ttl, data)
+                await _call(pipe.execute())
+        except Exception:
+            for key in keys:
+                self.metrics.namespace(key).errors += 1
+            return
+        # Одна запись конвейера на каждое пространство ключей пачки
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for namespace in {key.partition(":")[0] for key in keys}:
+            self.metrics.namespace(namespace).set_latency.observe(elapsed_ms)
+        if self.local is not None:
+            for key, physical_key in zip(keys, physical_keys):
+                self.local.set(physical_key, items[key], ttl)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: int = 3600,
+        soft_ttl: Optional[int] = None,
+    ) -> Any:
+        """Возвращает значение из кэша или вычисляет его ровно один раз.
+
+        Конкурентные промахи внутри воркера ждут один и тот же вызов ``loader``,
+        а между воркерами пересчет сериализуется короткой блокировкой в Redis.
+        Исключения ``loader`` (например, HTTPException 404) получают все ожидающие.
+
+        С ``soft_ttl`` включается stale-while-revalidate: запись старше ``soft_ttl``
+        (или пережившая мягкую инвалидацию) отдается сразу, а обновляет ее одна
+        фоновая задача. ``ttl`` остается жестким сроком жизни записи в Redis,
+        поэтому ``loader`` не должен зависеть от сессии БД текущего запроса.
+        """
+        if soft_ttl is None:
+            value = await self.get(key)
+        else:
+            value, is_stale = await self._get_with_staleness(key, ttl, soft_ttl)
+            if value is not None and is_stale:
+                self._schedule_refresh(key, loader, ttl, soft_ttl)
+        if value is not None:
+            return value
+
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Отменили запрос, который вел вычисление, - пересчитываем сами
+                if not inflight.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._compute_with_lock(key, loader, ttl, soft_ttl=soft_ttl)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Помечаем исключение полученным, даже если ожидающих не было
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _get_with_staleness(self, key: str, ttl: int, soft_ttl: int) -> tuple:
+        """Читает значение вместе с признаком устаревания.
+
+        Возраст записи выводится из оставшегося PTTL, поэтому отдельные
+        метаданные в Redis не хранятся.
+        """
+        metrics = self.metrics.namespace(key)
+        started = time.perf_counter()
+        physical_key = await self._physical_key(key)
+        if self.local is not None:
+            value = self.local.get(physical_key)
+            if value is not None:
+                # В L1 записи с soft_ttl кладутся только свежими и не дольше, чем им осталось быть свежими
+                metrics.hits += 1
+                metrics.l1_hits += 1
+                metrics.get_latency.observe((time.perf_counter() - started) * 1000)
+                return value, False
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(physical_key)
+                pipe.pttl(physical_key)
+                data, pttl = await _call(pipe.execute())
+            value = _decode(data) if data else None
+        except Exception:
+            metrics.errors += 1
+            metrics.misses += 1
+            return None, False
+        metrics.get_latency.observe((time.perf_counter() - started) * 1000)
+        if value is None:
+            metrics.misses += 1
+            return None, False
+        metrics.hits += 1
+        metrics.bytes_read += len(data)
+
+        now = time.time()
+        written_at = now - max(ttl - pttl / 1000, 0) if pttl > 0 else now
+        state = self._namespaces.get(key.partition(":")[0])
+        touched_at = state[1] if state is not None else 0.0
+        fresh_for = written_at + soft_ttl - now
+        if fresh_for <= 0 or written_at < touched_at:
+            metrics.stale_hits += 1
+            return value, True
+        if self.local is not None:
+            self.local.set(physical_key, value, fresh_for)
+        return value, False
+
+    def _schedule_refresh(self, key: str, loader, ttl: int, soft_ttl: int):
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+        task = asyncio.get_running_loop().create_task(self._refresh(key, loader, ttl, soft_ttl))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, key: str, loader, ttl: int, soft_ttl: int):
+        try:
+            await self._compute_with_lock(key, loader, ttl, wait=False, soft_ttl=soft_ttl)
+        except Exception as e:
+            print(f"⚠️ Background cache refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def _compute_with_lock(
+        self, key: str, loader, ttl: int, wait: bool = True, soft_ttl: Optional[int] = None
+    ) -> Any:
+        # Ключ фиксируется до вычисления: если во время пересчета пространство
+        # инвалидируют, результат уйдет в старое поколение и не будет прочитан
+        physical_key = await self._physical_key(key)
+        lock_key = LOCK_KEY_PREFIX + physical_key
+        token = uuid.uuid4().hex
+        try:
+            locked = await _call(redis_client.set(lock_key, token, nx=True, px=int(CACHE_LOCK_TTL * 1000)))
+        except Exception:
+            # Без Redis координировать воркеры нечем - просто считаем
+            locked = True
+            token = None
+
+        if not locked and not wait:
+            # Фоновое обновление уже идет в другом воркере
+            return None
+
+        if not locked:
+            # Другой воркер уже пересчитывает значение - ждем его результат
+            deadline = time.monotonic() + CACHE_LOCK_TTL
+            while time.monotonic() < deadline:
+                await asyncio.sleep(CACHE_LOCK_POLL_INTERVAL)
+                if soft_ttl is None:
+                    value = await self.get(key)
+                else:
+                    value, _ = await self._get_with_staleness(key, ttl, soft_ttl)
+                if value is not None:
+                    return value
+                # Блокировку отпустили без значения (loader упал) - забираем ее сами,
+                # а не ждем до конца CACHE_LOCK_TTL
+                try:
+                    locked = await _call(
+                        redis_client.set(lock_key, token, nx=True, px=int(CACHE_LOCK_TTL * 1000))
+                    )
+                except Exception:
+                    break
+                if locked:
+                    break
+            if not locked:
+                token = None
+
+        try:
+            value = await run_loader(loader)
+            if value is not None:
+                # Запись с soft_ttl не должна отдаваться из L1 дольше, чем она свежая
+                await self._set_physical(physical_key, value, ttl, soft_ttl)
+            return value
+        finally:
+            if token is not None:
+                try:
+                    await _call(redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token))
+                except Exception:
+                    pass
+
+    async def delete(self, key: str):
+        key = await self._physical_key(key)
+        try:
+            await _call(redis_client.delete(key))
+        except Exception:
+            self.metrics.namespace(key).errors += 1
+        message = {"op": "delete", "key": key}
+        self._invalidate_local(message)
+        await self._publish(message)
+
+    async def delete_many(self, keys: Iterable[str]):
+        """Удаляет ключи одним DEL и одним сообщением инвалидации"""
+        keys = await self._physical_keys(list(keys))
+        if not keys:
+            return
+        try:
+            await _call(redis_client.delete(*keys))
+        except Exception:
+            self.metrics.namespace(keys[0]).errors += 1
+        message = {"op": "delete_many", "keys": keys}
+        self._invalidate_local(message)
+        await self._publish(message)
+
+    async def invalidate_namespace(self, namespace: str, soft: bool = False):
+        """Инвалидирует все ключи ``<namespace>:*`` за один INCR.
+
+        При ``soft=True`` записи не выбрасываются, а только помечаются устаревшими:
+        читатели с ``soft_ttl`` продолжают их отдавать до фонового обновления.
+        """
+        try:
+            if soft:
+                touched_at = time.time()
+                await _call(redis_client.set(TOUCH_KEY_PREFIX + namespace, touched_at))
+                message = {"op": "touch", "namespace": namespace, "touched_at": touched_at}
+            else:
+                generation = await _call(redis_client.incr(GENERATION_KEY_PREFIX + namespace))
+                message = {"op": "generation", "namespace": namespace, "generation": generation}
+        except Exception:
+            return
+        self._invalidate_local(message)
+        await self._publish(message)
+
+    async def invalidate_pattern(self, pattern: str):
+        namespace = _namespace_of_pattern(pattern)
+        if namespace is not None:
+            await self.invalidate_namespace(namespace)
+            return
+        # Произвольный шаблон: инкрементальный SCAN вместо блокирующего KEYS
+        prefix = pattern.partition(":")[0]
+        if not any(ch in prefix for ch in "*?[]"):
+            pattern = await self._physical_key(pattern)
+        # Каждый шаг SCAN идет через _call: предохранитель и учет ошибок как у остальных команд
+        try:
+            cursor = 0
+            while True:
+                cursor, keys = await _call(redis_client.scan(cursor, match=pattern, count=1000))
+                if keys:
+                    await _call(redis_client.delete(*keys))
+                if not cursor:
+                    break
         except Exception:
             pass
-    
-    @staticmethod
-    async def invalidate_pattern(pattern: str):
+        message = {"op": "pattern", "pattern": pattern}
+        self._invalidate_local(message)
+        await self._publish(message)
+
+    async def _physical_key(self, key: str) -> str:
+        return (await self._physical_keys([key]))[0]
+
+    async def _physical_keys(self, keys: List[str]) -> List[str]:
+        parts = [key.partition(":") for key in keys]
+        generations = await self._load_generations({namespace for namespace, sep, _ in parts if sep})
+        return [
+            f"{namespace}:v{generations[namespace]}:{rest}" if sep else namespace
+            for namespace, sep, rest in parts
+        ]
+
+    async def _load_generations(self, namespaces: Iterable[str]) -> Dict[str, int]:
+        now = time.monotonic()
+        result = {}
+        stale = []
+        for namespace in namespaces:
+            state = self._namespaces.get(namespace)
+            if state is not None and state[2] > now:
+                result[namespace] = state[0]
+            else:
+                stale.append(namespace)
+        if not stale:
+            return result
+        keys = []
+        for namespace in stale:
+            keys += [GENERATION_KEY_PREFIX + namespace, TOUCH_KEY_PREFIX + namespace]
         try:
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
+            values = await _call(redis_client.mget(keys))
+        except Exception:
+            # Redis недоступен - продолжаем с последними известными поколениями
+            for namespace in stale:
+                state = self._namespaces.get(namespace)
+                result[namespace] = state[0] if state is not None else 0
+            return result
+        for index, namespace in enumerate(stale):
+            generation = int(values[2 * index] or 0)
+            touched_at = float(values[2 * index + 1] or 0)
+            self._namespaces[namespace] = (generation, touched_at, now + CACHE_GENERATION_TTL)
+            result[namespace] = generation
+        return result
+
+    async def _publish(self, message: dict):
+        """Рассылает инвалидацию остальным воркерам через Redis pub/sub"""
+        try:
+            await _call(redis_client.publish(CACHE_INVALIDATION_CHANNEL, orjson.dumps(message)))
         except Exception:
             pass
 
+    def _invalidate_local(self, message: dict):
+        if message.get("op") in ("generation", "touch"):
+            namespace = message["namespace"]
+            generation, touched_at, _ = self._namespaces.get(namespace, (0, 0.0, 0.0))
+            if message["op"] == "generation":
+                generation = message["generation"]
+            else:
+                touched_at = max(touched_at, message["touched_at"])
+            self._namespaces[namespace] = (
+                generation, touched_at, time.monotonic() + CACHE_GENERATION_TTL
+            )
+            if self.local is not None:
+                self.local.delete_pattern(f"{namespace}:*")
+            return
+        if self.local is None:
+            return
+        if message.get("op") == "delete":
+            self.local.delete(message["key"])
+        elif message.get("op") == "delete_many":
+            for key in message["keys"]:
+                self.local.delete(key)
+        elif message.get("op") == "pattern":
+            self.local.delete_pattern(message["pattern"])
+
+    def _reset_local(self):
+        self._namespaces.clear()
+        if self.local is not None:
+            self.local.clear()
+        self._notify_handlers(None)
+
+    def _handle_invalidation(self, message: dict):
+        try:
+            message = orjson.loads(message["data"])
+            self._invalidate_local(message)
+        except Exception:
+            # Не можем разобрать сообщение - безопаснее сбросить всё локальное состояние
+            self._reset_local()
+            return
+        self._notify_handlers(message)
+
+    def add_invalidation_handler(self, handler: Callable[[Optional[dict]], None]):
+        """Подписывает обработчик на сообщения канала инвалидаций.
+
+        Обработчик получает сообщение или None, если локальное состояние сброшено
+        и часть сообщений могла потеряться.
+        """
+        self._handlers.append(handler)
+
+    def _notify_handlers(self, message: Optional[dict]):
+        for handler in self._handlers:
+            try:
+                handler(message)
+            except Exception as e:
+                print(f"⚠️ Cache invalidation handler error: {e}")
+
+    async def broadcast(self, message: dict):
+        """Применяет сообщение в этом воркере и рассылает его остальным"""
+        self._notify_handlers(message)
+        await self._publish(message)
+
+    async def _listen_invalidations(self):
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # Пока подписки не было, сообщения могли потеряться
+                self._reset_local()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._handle_invalidation(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Без подписки устаревание ограничено CACHE_L1_TTL и CACHE_GENERATION_TTL
+                print(f"⚠️ Cache invalidation listener error: {e}")
+                await asyncio.sleep(5.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние кэша воркера"""
+        return {
+            "l1_enabled": self.local is not None,
+            "l1_entries": len(self.local) if self.local is not None else 0,
+            "l1_max_entries": self.local.max_entries if self.local is not None else 0,
+            "circuit_breaker": circuit_breaker.to_dict(),
+            "compression": compression_stats.to_dict(),
+            "namespaces": self.metrics.to_dict(),
+        }
+
+    def start_invalidation_listener(self):
+        """Подписывает воркер на канал инвалидаций (вызывается из lifespan)"""
+        if self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen_invalidations())
+
+    async def stop_invalidation_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+class CompressionStats:
+    """Счетчики сжатия значений, записанных этим воркером"""
+
+    def __init__(self):
+        self.values = 0
+        self.compressed_values = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def record(self, raw_size: int, stored_size: int, compressed: bool):
+        self.values += 1
+        self.compressed_values += compressed
+        self.raw_bytes += raw_size
+        self.stored_bytes += stored_size
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "values": self.values,
+            "compressed_values": self.compressed_values,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "ratio": round(self.raw_bytes / self.stored_bytes, 3) if self.stored_bytes else 1.0,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        data = RAW_HEADER + bytes(value)
+    else:
+        data = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    if len(data) >= CACHE_COMPRESS_MIN_BYTES:
+        compressed = ZLIB_HEADER + zlib.compress(data, CACHE_COMPRESS_LEVEL)
+        if len(compressed) < len(data):
+            compression_stats.record(len(data), len(compressed), True)
+            return compressed
+    compression_stats.record(len(data), len(data), False)
+    return data
+
+
+def _decode(data: bytes) -> Any:
+    # Несжатые записи, в том числе созданные до включения сжатия, читаются как есть
+    if data[:1] == ZLIB_HEADER:
+        data = zlib.decompress(data[1:])
+    if data[:1] == RAW_HEADER:
+        return data[1:]
+    return orjson.loads(data)
+
+
+async def run_loader(loader: Callable[[], Union[Any, Awaitable[Any]]]) -> Any:
+    """Корутину ждем в цикле событий, синхронный loader (запросы к БД) - в пуле потоков,
+    чтобы пересчет не блокировал остальные запросы воркера"""
+    if inspect.iscoroutinefunction(loader):
+        return await loader()
+    value = await asyncio.to_thread(loader)
+    if inspect.isawaitable(value):
+        value = await value
+    return value
 
-cache = Cache()
 
+async def _call(awaitable):
+    """Выполняет команду Redis с ограничением по времени и через предохранитель"""
+    if not circuit_breaker.allow():
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise CacheUnavailable("Redis circuit breaker is open")
+    try:
+        result = await asyncio.wait_for(awaitable, CACHE_OP_TIMEOUT)
+    except asyncio.CancelledError:
+        circuit_breaker.record_cancelled()
+        raise
+    except Exception:
+        circuit_breaker.record_failure()
+        raise
+    circuit_breaker.record_success()
+    return result
 
 
+def _namespace_of_pattern(pattern: str) -> Optional[str]:
+    """Возвращает namespace для шаблонов вида ``<namespace>:*``"""
+    namespace, sep, rest = pattern.partition(":")
+    if sep and rest == "*" and not any(ch in namespace for ch in "*?[]"):
+        return namespace
+    return None
 
 
+cache = Cache(LocalCache(CACHE_L1_MAX_ENTRIES, CACHE_L1_TTL) if CACHE_L1_ENABLED else None)
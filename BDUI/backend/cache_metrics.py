@@ -0,0 +1,103 @@
+from bisect import bisect_left
+from typing import Any, Dict, Optional
+
+# Верхние границы корзин гистограммы задержек, мс
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами (O(log n) на наблюдение)"""
+
+    __slots__ = ("counts", "count", "total_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает квантиль q (None - выше последней)"""
+        if not self.count:
+            return 0.0
+        threshold = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= threshold:
+                break
+        if index < len(LATENCY_BUCKETS_MS):
+            return float(LATENCY_BUCKETS_MS[index])
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class NamespaceMetrics:
+    __slots__ = (
+        "hits", "l1_hits", "misses", "stale_hits", "errors",
+        "bytes_read", "bytes_written", "get_latency", "set_latency",
+    )
+
+    def __init__(self):
+        self.hits = 0
+        self.l1_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.errors = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.get_latency = LatencyHistogram()
+        self.set_latency = LatencyHistogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "get_latency": self.get_latency.to_dict(),
+            "set_latency": self.set_latency.to_dict(),
+        }
+
+
+class CacheMetrics:
+    """Счетчики кэша по семействам ключей (namespace = часть ключа до первого ':').
+
+    Счетчики живут в памяти воркера и не синхронизируются между процессами.
+    """
+
+    def __init__(self):
+        self.namespaces: Dict[str, NamespaceMetrics] = {}
+
+    def namespace(self, key: str) -> NamespaceMetrics:
+        namespace = key.partition(":")[0]
+        metrics = self.namespaces.get(namespace)
+        if metrics is None:
+            metrics = self.namespaces[namespace] = NamespaceMetrics()
+        return metrics
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {namespace: metrics.to_dict() for namespace, metrics in sorted(self.namespaces.items())}
+
+    def reset(self):
+        self.namespaces.clear()
@@ -0,0 +1,123 @@
+"""
+Прогрев кэша после деплоя или очистки Redis
+Использование: python cache_warmup.py
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Tuple
+from models import Screen as ScreenModel, Component as ComponentModel, Template as TemplateModel
+from schemas import Screen, Component, Template
+from database import session_scope
+from cache import cache, redis_client
+from response_cache import pack_json
+from screen_resolver import candidate_routes, resolution_cache_key, route_entry, RESOLVE_CACHE_TTL
+from routers.screens import SCREEN_CACHE_TTL, screen_tag
+
+CACHE_WARMUP_ENABLED = os.getenv("CACHE_WARMUP_ENABLED", "false").lower() == "true"
+# Сколько секунд старт приложения может ждать прогрева
+CACHE_WARMUP_BUDGET = float(os.getenv("CACHE_WARMUP_BUDGET", "5"))
+
+# TTL по умолчанию у списков компонентов и шаблонов
+DEFAULT_CACHE_TTL = 3600
+
+
+def collect_entries() -> List[Tuple[int, Dict[str, Any]]]:
+    """Читает активные экраны, компоненты и шаблоны тремя запросами.
+
+    Возвращает пары (TTL, записи кэша) в том же формате, что пишут
+    эндпоинты. Fallback по локали разрешается в памяти для всех локалей,
+    встречающихся среди активных экранов.
+    """
+    with session_scope() as db:
+        screens = db.query(ScreenModel).filter(ScreenModel.is_active == True).all()
+        components = db.query(ComponentModel).all()
+        templates = db.query(TemplateModel).all()
+
+        # screen:{id} - общая запись экрана по id и по имени (см. routers.screens.get_screen_entry)
+        screen_entries = {}
+        for screen in screens:
+            value = Screen.from_orm(screen).dict()
+            screen_entries[f"screen:{screen.id}"] = pack_json(value, screen_tag(value))
+
+        default_entries = {}
+        default_entries["components:None:None"] = pack_json(
+            [Component.from_orm(component).dict() for component in components]
+        )
+        default_entries["components:categories"] = pack_json(
+            [category for category in dict.fromkeys(c.category for c in components) if category]
+        )
+        default_entries["templates:None:None"] = pack_json(
+            [Template.from_orm(template).dict() for template in templates]
+        )
+        default_entries["templates:categories"] = pack_json(
+            [category for category in dict.fromkeys(t.category for t in templates) if category]
+        )
+
+    by_route = {(screen.name, screen.platform, screen.locale): screen for screen in screens}
+    locales = {locale for _, _, locale in by_route}
+    names = {(name, platform) for name, platform, _ in by_route}
+    names |= {
+        (name[:-len("_en")], platform)
+        for name, platform, locale in by_route
+        if locale == "en" and name.endswith("_en")
+    }
+
+    now = time.time()
+    resolve_entries = {}
+    for name, platform in names:
+        routes = {}
+        for locale in locales:
+            screen = next(
+                (by_route[route] for route in candidate_routes(name, platform, locale) if route in by_route),
+                None
+            )
+            if screen is None:
+                continue
+            routes[locale] = route_entry(screen.id, now)
+        if routes:
+            resolve_entries[resolution_cache_key(name, platform)] = routes
+
+    # Списком, а не словарем по TTL: группы с одинаковым TTL не затирают друг друга
+    return [
+        (DEFAULT_CACHE_TTL, default_entries),
+        (SCREEN_CACHE_TTL, screen_entries),
+        (RESOLVE_CACHE_TTL, resolve_entries),
+    ]
+
+
+async def warm_up_cache() -> int:
+    """Заполняет кэш и возвращает количество записанных ключей"""
+    start_time = time.time()
+    groups = await asyncio.to_thread(collect_entries)
+
+    count = 0
+    for ttl, items in groups:
+        if items:
+            await cache.set_many(items, ttl=ttl)
+            count += len(items)
+
+    print(f"🔥 Прогрев кэша: {count} записей за {(time.time() - start_time) * 1000:.0f} мс")
+    return count
+
+
+async def warm_up_within_budget(budget: float = CACHE_WARMUP_BUDGET) -> int:
+    """Прогрев при старте: не задерживает готовность дольше budget секунд"""
+    try:
+        return await asyncio.wait_for(warm_up_cache(), timeout=budget)
+    except asyncio.TimeoutError:
+        print(f"⚠️  Прогрев кэша не уложился в {budget:g} с, продолжаем без него")
+    except Exception as e:
+        print(f"❌ Ошибка прогрева кэша: {e}")
+    return 0
+
+
+async def main():
+    try:
+        await warm_up_cache()
+    finally:
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Индекс компонентов экрана: id компонента -> JSON Pointer в config
+"""
+from typing import Any, Dict, List
+from cache import cache
+from json_patch import format_pointer
+
+COMPONENT_INDEX_TTL = 24 * 3600
+
+
+def component_index_key(screen_id: int) -> str:
+    return f"component_index:{screen_id}"
+
+
+def build_component_index(config: Any) -> Dict[str, str]:
+    """Один обход config: компонент - объект со строковыми id и type.
+
+    При повторяющемся id в индекс попадает первый по порядку обхода.
+    """
+    index: Dict[str, str] = {}
+    _collect(config, [], index)
+    return index
+
+
+def _collect(node: Any, tokens: List[Any], index: Dict[str, str]):
+    if isinstance(node, dict):
+        component_id = node.get("id")
+        if isinstance(component_id, str) and isinstance(node.get("type"), str):
+            index.setdefault(component_id, format_pointer(tokens))
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                _collect(value, tokens + [key], index)
+    elif isinstance(node, list):
+        for position, item in enumerate(node):
+            if isinstance(item, (dict, list)):
+                _collect(item, tokens + [position], index)
+
+
+def index_entry(screen: Dict[str, Any]) -> Dict[str, Any]:
+    return {"version": screen["version"], "paths": build_component_index(screen["config"])}
+
+
+async def get_component_index(screen: Dict[str, Any]) -> Dict[str, str]:
+    """Индекс текущей версии экрана.
+
+    Строится при сохранении экрана (screen_materializer); здесь - только если
+    запись вытеснена или устарела, и затем снова кэшируется на версию.
+    """
+    key = component_index_key(screen["id"])
+    entry = await cache.get(key)
+    if entry is None or entry["version"] != screen["version"]:
+        entry = index_entry(screen)
+        await cache.set(key, entry, ttl=COMPONENT_INDEX_TTL)
+    return entry["paths"]
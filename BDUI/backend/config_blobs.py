@@ -0,0 +1,170 @@
+"""
+Контентно-адресуемое представление config: поддеревья заменяются ссылками {"$blob": sha256}
+
+Блоб - JSON поддерева, в котором вложенные блобы уже заменены ссылками, поэтому хэш
+родителя зависит только от хэшей детей (дерево Меркла) и одинаковые поддеревья
+разных config совпадают вплоть до общего блоба. Собранные поддеревья кэшируются
+байтами по хэшу: содержимое блоба неизменно, инвалидация не нужна.
+Объект вида {"$blob": "<64 hex>"} внутри config зарезервирован под ссылку.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import orjson
+
+# Поддеревья меньше этого размера остаются в родителе: ссылка на них не окупается
+CONFIG_BLOB_MIN_BYTES = int(os.getenv("CONFIG_BLOB_MIN_BYTES", "256"))
+# Объем собранных поддеревьев в памяти процесса
+CONFIG_BLOB_CACHE_BYTES = int(os.getenv("CONFIG_BLOB_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+BLOB_REF = "$blob"
+# orjson кодирует ссылку ровно так; внутри строк кавычки экранированы, ложных совпадений нет
+_REF_PATTERN = re.compile(rb'\{"\$blob":"([0-9a-f]{64})"\}')
+
+# hashes -> {hash: байты блоба}; отсутствующих в хранилище хэшей в ответе нет
+BlobFetcher = Callable[[List[str]], Dict[str, bytes]]
+
+
+class ConfigBlobMissingError(LookupError):
+    """Ссылка на блоб, которого нет в хранилище"""
+
+
+def blob_ref(digest: str) -> Dict[str, str]:
+    return {BLOB_REF: digest}
+
+
+def ref_digest(value: Any) -> Optional[str]:
+    """Хэш, если value - ссылка на блоб"""
+    if isinstance(value, dict) and len(value) == 1:
+        digest = value.get(BLOB_REF)
+        if isinstance(digest, str):
+            return digest
+    return None
+
+
+def child_digests(data: bytes) -> List[str]:
+    return [digest.decode() for digest in _REF_PATTERN.findall(data)]
+
+
+def splice(data: bytes, assembled: Dict[str, bytes]) -> bytes:
+    """Подставляет собранные поддеревья вместо ссылок прямо в JSON"""
+    return _REF_PATTERN.sub(lambda match: assembled[match.group(1).decode()], data)
+
+
+def split_config(config: Any, min_bytes: int = CONFIG_BLOB_MIN_BYTES) -> Tuple[Any, Dict[str, bytes], Dict[str, bytes]]:
+    """(ссылка на корень, блобы, собранные поддеревья) по хэшам.
+
+    Корень всегда становится блобом, поэтому сохраненный config - либо ссылка, либо
+    config целиком; скаляры и None не меняются.
+    """
+    blobs: Dict[str, bytes] = {}
+    assembled: Dict[str, bytes] = {}
+
+    def visit(node: Any, root: bool = False) -> Any:
+        if isinstance(node, dict):
+            node = {key: visit(value) for key, value in node.items()}
+        elif isinstance(node, list):
+            node = [visit(item) for item in node]
+        else:
+            return node
+        data = orjson.dumps(node)
+        if len(data) < min_bytes and not root:
+            return node
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in blobs:
+            blobs[digest] = data
+            assembled[digest] = splice(data, assembled)
+        return blob_ref(digest)
+
+    return visit(config, root=True), blobs, assembled
+
+
+class AssembledBlobCache:
+    """LRU собранных поддеревьев (байты JSON), ограниченный суммарным размером"""
+
+    def __init__(self, max_bytes: int = CONFIG_BLOB_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(digest)
+            if data is not None:
+                self._entries.move_to_end(digest)
+            return data
+
+    def put_many(self, items: Dict[str, bytes]):
+        with self._lock:
+            for digest, data in items.items():
+                if digest in self._entries or len(data) > self.max_bytes:
+                    continue
+                self._entries[digest] = data
+                self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+assembled_blobs = AssembledBlobCache()
+
+
+def assemble_config(value: Any, fetch: BlobFetcher, cache: AssembledBlobCache = assembled_blobs) -> Any:
+    """Собирает сохраненный config; значение без ссылки на корень возвращается как есть.
+
+    Блобы, которых нет в кэше, читаются пачками по уровням дерева.
+    """
+    digest = ref_digest(value)
+    if digest is None:
+        return value
+    data = cache.get(digest)
+    if data is None:
+        data = _assemble(digest, fetch, cache)
+    return orjson.loads(data)
+
+
+def _assemble(digest: str, fetch: BlobFetcher, cache: AssembledBlobCache) -> bytes:
+    raw: Dict[str, bytes] = {}
+    pending = [digest]
+    while pending:
+        raw.update(_fetch_all(pending, fetch))
+        pending = list(dict.fromkeys(
+            child for parent in pending for child in child_digests(raw[parent])
+            if child not in raw and cache.get(child) is None
+        ))
+
+    assembled: Dict[str, bytes] = {}
+
+    def build(current: str) -> bytes:
+        if current in assembled:
+            return assembled[current]
+        data = cache.get(current)
+        if data is None:
+            if current not in raw:
+                # Вытеснен из кэша между обходом и сборкой
+                raw.update(_fetch_all([current], fetch))
+            data = splice(raw[current], {child: build(child) for child in child_digests(raw[current])})
+        assembled[current] = data
+        return data
+
+    data = build(digest)
+    cache.put_many(assembled)
+    return data
+
+
+def _fetch_all(digests: Iterable[str], fetch: BlobFetcher) -> Dict[str, bytes]:
+    digests = list(digests)
+    found = fetch(digests)
+    missing = [digest for digest in digests if digest not in found]
+    if missing:
+        raise ConfigBlobMissingError(f"Config blobs not found: {', '.join(missing[:5])}")
+    return found
@@ -0,0 +1,220 @@
+"""
+Опциональное дедуплицированное хранение config экранов, шаблонов и снимков версий
+
+При CONFIG_BLOB_STORE_ENABLED поддеревья config пишутся в config_blobs по хэшу
+(config_blobs.split_config), а в строке остается ссылка на корень. Копия экрана,
+экран из шаблона, наследник шаблона, локализованный вариант и снимок версии
+добавляют только блобы изменившихся поддеревьев.
+
+ORM объекты получают собранный config (события load/refresh), запись через ORM
+раскладывается на блобы перед flush; запросы по отдельным колонкам и Core-запись
+вызывают load_config/store_configs явно. Ссылки читаются и при выключенном
+хранилище, поэтому его можно выключить без миграции данных.
+Использование:
+    python config_store.py pack   # перевести сохраненные config на блобы
+    python config_store.py gc     # удалить блобы без ссылок (при остановленной записи)
+"""
+import argparse
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, attributes
+from models import ConfigBlob, Screen as ScreenModel, ScreenVersion, Template as TemplateModel
+from database import session_scope
+from config_blobs import assembled_blobs, assemble_config, child_digests, ref_digest, split_config
+
+CONFIG_BLOB_STORE_ENABLED = os.getenv("CONFIG_BLOB_STORE_ENABLED", "false").lower() == "true"
+# Хэшей в одном IN (...) и строк в одной пачке pack/gc
+CONFIG_BLOB_BATCH_SIZE = 500
+
+# Модель -> колонка с config; у ScreenVersion блобами хранятся только снимки
+STORED_CONFIGS = {ScreenModel: "config", TemplateModel: "config", ScreenVersion: "data"}
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _batches(items: List[Any]) -> Iterator[List[Any]]:
+    for start in range(0, len(items), CONFIG_BLOB_BATCH_SIZE):
+        yield items[start:start + CONFIG_BLOB_BATCH_SIZE]
+
+
+def fetch_blobs(db: Session, digests: List[str]) -> Dict[str, bytes]:
+    # Через соединение сессии: без autoflush и с блобами текущей транзакции
+    connection = db.connection()
+    found = {}
+    for batch in _batches(digests):
+        for row in connection.execute(select(ConfigBlob.hash, ConfigBlob.data).where(ConfigBlob.hash.in_(batch))):
+            found[row.hash] = row.data.encode()
+    return found
+
+
+def save_blobs(db: Session, blobs: Dict[str, bytes]):
+    """Пишет только отсутствующие блобы; параллельная запись того же блоба не конфликтует"""
+    if not blobs:
+        return
+    connection = db.connection()
+    existing: Set[str] = set()
+    for batch in _batches(list(blobs)):
+        existing.update(connection.execute(select(ConfigBlob.hash).where(ConfigBlob.hash.in_(batch))).scalars())
+    rows = [{"hash": digest, "data": data.decode()} for digest, data in blobs.items() if digest not in existing]
+    if rows:
+        insert = _INSERTS[connection.dialect.name](ConfigBlob)
+        connection.execute(insert.on_conflict_do_nothing(index_elements=[ConfigBlob.hash]), rows)
+
+
+def store_configs(db: Session, configs: List[Any]) -> List[Any]:
+    """Значения для записи в колонку: ссылки на корни (или сами config, если хранилище выключено)"""
+    if not CONFIG_BLOB_STORE_ENABLED:
+        return configs
+    blobs: Dict[str, bytes] = {}
+    assembled: Dict[str, bytes] = {}
+    stored = []
+    for config in configs:
+        if ref_digest(config) is not None or not isinstance(config, (dict, list)):
+            stored.append(config)
+            continue
+        root, config_blobs, config_assembled = split_config(config)
+        blobs.update(config_blobs)
+        assembled.update(config_assembled)
+        stored.append(root)
+    save_blobs(db, blobs)
+    # Только что записанный config обычно сразу читается (ответ, материализация)
+    assembled_blobs.put_many(assembled)
+    return stored
+
+
+def store_config(db: Session, config: Any) -> Any:
+    return store_configs(db, [config])[0]
+
+
+def load_config(db: Session, value: Any) -> Any:
+    """Собранный config из значения колонки"""
+    return assemble_config(value, lambda digests: fetch_blobs(db, digests))
+
+
+def _stored_attribute(instance: Any) -> Optional[str]:
+    attr = STORED_CONFIGS.get(type(instance))
+    if attr == "data" and not instance.is_snapshot:
+        return None
+    return attr
+
+
+@event.listens_for(Session, "before_flush")
+def _pack_configs(session: Session, flush_context, instances):
+    session.info["config_store_restore"] = []
+    if not CONFIG_BLOB_STORE_ENABLED:
+        return
+    targets = []
+    for instance in list(session.new) + list(session.dirty):
+        attr = _stored_attribute(instance)
+        if attr and attributes.get_history(instance, attr).added:
+            targets.append((instance, attr, getattr(instance, attr)))
+    if not targets:
+        return
+
+    stored = store_configs(session, [value for _, _, value in targets])
+    for (instance, attr, value), packed in zip(targets, stored):
+        if packed is not value:
+            setattr(instance, attr, packed)
+            session.info["config_store_restore"].append((instance, attr, value))
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _restore_configs(session: Session, flush_context):
+    # В объекте после flush остается собранный config, а не ссылка
+    for instance, attr, value in session.info.pop("config_store_restore", []):
+        attributes.set_committed_value(instance, attr, value)
+
+
+def _unpack_listeners(attr: str):
+    def unpack(target, context, attrs=None):
+        value = target.__dict__.get(attr)
+        if ref_digest(value) is not None:
+            attributes.set_committed_value(target, attr, load_config(context.session, value))
+
+    return unpack
+
+
+for _model, _attr in STORED_CONFIGS.items():
+    _unpack = _unpack_listeners(_attr)
+    event.listen(_model, "load", _unpack)
+    event.listen(_model, "refresh", _unpack)
+
+
+def _stored_rows(db: Session, model: Any, attr: str) -> Iterator[Any]:
+    """(id, значение колонки) без сборки config"""
+    column = getattr(model, attr)
+    query = db.query(model.id, column.label("value"))
+    if model is ScreenVersion:
+        query = query.filter(ScreenVersion.is_snapshot == True)
+    return query.yield_per(CONFIG_BLOB_BATCH_SIZE)
+
+
+def pack_configs(db: Session) -> int:
+    """Переводит сохраненные целиком config на блобы; содержимое и updated_at не меняются"""
+    packed = 0
+    for model, attr in STORED_CONFIGS.items():
+        table = model.__table__
+        rows = [row for row in _stored_rows(db, model, attr) if ref_digest(row.value) is None]
+        for batch in _batches(rows):
+            stored = store_configs(db, [row.value for row in batch])
+            values = {attr: bindparam("_value", type_=table.c[attr].type)}
+            if "updated_at" in table.c:
+                values["updated_at"] = table.c.updated_at
+            db.connection().execute(
+                update(table).where(table.c.id == bindparam("_id")).values(values),
+                [{"_id": row.id, "_value": value} for row, value in zip(batch, stored)]
+            )
+            packed += len(batch)
+    return packed
+
+
+def collect_garbage(db: Session) -> int:
+    """Удаляет блобы, недостижимые из экранов, шаблонов и снимков версий.
+
+    Блоб, на который ссылается еще не закоммиченная запись, для сборщика
+    недостижим, поэтому запускать его нужно при остановленной записи.
+    """
+    reachable: Set[str] = set()
+    pending: Iterable[str] = [
+        digest
+        for model, attr in STORED_CONFIGS.items()
+        for digest in (ref_digest(row.value) for row in _stored_rows(db, model, attr))
+        if digest is not None
+    ]
+    while pending:
+        pending = list(set(pending) - reachable)
+        reachable.update(pending)
+        found = fetch_blobs(db, pending)
+        pending = [child for data in found.values() for child in child_digests(data)]
+
+    unreachable = [row.hash for row in db.query(ConfigBlob.hash) if row.hash not in reachable]
+    for batch in _batches(unreachable):
+        db.query(ConfigBlob).filter(ConfigBlob.hash.in_(batch)).delete(synchronize_session=False)
+    return len(unreachable)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Дедуплицированное хранение config BDUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("pack")
+    commands.add_parser("gc")
+    args = parser.parse_args()
+
+    with session_scope() as db:
+        if args.command == "pack":
+            if not CONFIG_BLOB_STORE_ENABLED:
+                print("❌ Хранилище выключено: задайте CONFIG_BLOB_STORE_ENABLED=true")
+                return
+            count = pack_configs(db)
+            db.commit()
+            print(f"📦 Переведено на блобы config: {count}")
+        else:
+            count = collect_garbage(db)
+            db.commit()
+            print(f"🧹 Удалено блобов без ссылок: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,10 @@
 """
 Модуль для автоматической инициализации экранов при первом запуске
 """
-import json
-import os
 from pathlib import Path
-from sqlalchemy.orm import Session
 from models import Screen
 from database import SessionLocal
+from screen_transfer import ScreenImportError, import_screen_documents, iter_file_documents
 
 def init_screens_from_json():
     """
@@ -38,8 +36,7 @@ def init_screens_from_json():
             "avito_catalog_screen.json"
         ]
         
-        success_count = 0
-        
+        screen_paths = []
         for filename in screen_files:
             filepath = screens_dir / filename
             
@@ -47,44 +44,23 @@ def init_screens_from_json():
                 print(f"⚠️  Файл не найден: {filename}")
                 continue
             
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                screen_name = data.get('name')
-                if not screen_name:
-                    print(f"⚠️  Некорректный JSON в {filename}: отсутствует 'name'")
-                    continue
-                
-                screen = Screen(
-                    name=screen_name,
-                    title=data.get('title', ''),
-                    description=data.get('description', ''),
-                    config=data.get('config', {}),
-                    platform=data.get('platform', 'mobile'),
-                    locale=data.get('locale', 'ru'),
-                    is_active=data.get('is_active', True)
-                )
-                
-                db.add(screen)
-                db.commit()
-                
-                print(f"✅ Загружен: {screen_name}")
-                success_count += 1
-                
-            except json.JSONDecodeError as e:
-                print(f"❌ Ошибка парсинга JSON в {filename}: {e}")
-            except Exception as e:
-                print(f"❌ Ошибка при обработке {filename}: {e}")
-                db.rollback()
+            screen_paths.append(filepath)
         
-        if success_count > 0:
-            print(f"🎉 Успешно загружено {success_count} экран(ов)!")
-            return True
-        else:
+        if not screen_paths:
             print("⚠️  Не удалось загрузить ни одного экрана")
             return False
+        
+        # Все файлы загружаются одной транзакцией: ошибка в любом не оставит базу наполовину заполненной
+        result = import_screen_documents(
+            iter_file_documents(screen_paths), defaults={"platform": "mobile"}, verbose=False
+        )
+        
+        print(f"🎉 Успешно загружено {result.created} экран(ов)!")
+        return True
             
+    except ScreenImportError as e:
+        print(f"❌ Ошибка в JSON файле, экраны не загружены: {e}")
+        return False
     except Exception as e:
         print(f"❌ Ошибка при инициализации экранов: {e}")
         return False
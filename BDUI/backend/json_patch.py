@@ -0,0 +1,199 @@
+"""
+JSON Patch (RFC 6902) и JSON Pointer (RFC 6901) для конфигураций экранов
+"""
+import copy
+from typing import Any, Dict, List
+
+
+class JsonPatchError(ValueError):
+    """Некорректный патч или операция, неприменимая к документу"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _array_index(array: list, token: str, pointer: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(array)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index {token!r} in {pointer}")
+    index = int(token)
+    if index > len(array) or (index == len(array) and not allow_end):
+        raise JsonPatchError(f"Array index out of range in {pointer}")
+    return index
+
+
+def _get(document: Any, tokens: List[str], pointer: str) -> Any:
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f"Path not found: {pointer}")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(value, token, pointer)]
+        else:
+            raise JsonPatchError(f"Path not found: {pointer}")
+    return value
+
+
+def _equal(left: Any, right: Any) -> bool:
+    # В JSON true и 1 - разные значения, в Python они равны
+    if isinstance(left, bool) or isinstance(right, bool):
+        return type(left) is type(right) and left == right
+    if isinstance(left, dict) and isinstance(right, dict):
+        return left.keys() == right.keys() and all(_equal(left[key], right[key]) for key in left)
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(_equal(a, b) for a, b in zip(left, right))
+    return left == right
+
+
+def _add(document: Any, tokens: List[str], value: Any, pointer: str) -> Any:
+    if not tokens:
+        return value
+    parent = _get(document, tokens[:-1], pointer)
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, token, pointer, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Path not found: {pointer}")
+    return document
+
+
+def _remove(document: Any, tokens: List[str], pointer: str) -> Any:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the document root")
+    parent = _get(document, tokens[:-1], pointer)
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {pointer}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, token, pointer))
+    raise JsonPatchError(f"Path not found: {pointer}")
+
+
+def _member(operation: Dict[str, Any], name: str) -> Any:
+    if name not in operation:
+        raise JsonPatchError(f"Operation {operation.get('op')!r} requires {name!r}")
+    return operation[name]
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """Применяет операции к копии документа и возвращает результат.
+
+    Патч атомарен: при ошибке в любой операции исходный документ не меняется.
+    """
+    return apply_patch_in_place(copy.deepcopy(document), operations)
+
+
+def apply_patch_in_place(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """Как ``apply_patch``, но меняет сам документ (без копии и без атомарности)"""
+    if not isinstance(operations, list):
+        raise JsonPatchError("Patch must be a list of operations")
+    result = document
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise JsonPatchError("Patch operation must be an object")
+        op = _member(operation, "op")
+        pointer = _member(operation, "path")
+        tokens = parse_pointer(pointer)
+
+        if op == "add":
+            result = _add(result, tokens, copy.deepcopy(_member(operation, "value")), pointer)
+        elif op == "remove":
+            _remove(result, tokens, pointer)
+        elif op == "replace":
+            value = copy.deepcopy(_member(operation, "value"))
+            _get(result, tokens, pointer)
+            if not tokens:
+                result = value
+            else:
+                # Замена на месте сохраняет порядок ключей и элементов
+                parent = _get(result, tokens[:-1], pointer)
+                parent[tokens[-1] if isinstance(parent, dict) else int(tokens[-1])] = value
+        elif op in ("move", "copy"):
+            source = _member(operation, "from")
+            source_tokens = parse_pointer(source)
+            if op == "move":
+                if tokens[:len(source_tokens)] == source_tokens and len(tokens) > len(source_tokens):
+                    raise JsonPatchError(f"Cannot move {source} into its own child {pointer}")
+                value = _get(result, source_tokens, source)
+                if source_tokens == tokens:
+                    continue
+                _remove(result, source_tokens, source)
+            else:
+                value = copy.deepcopy(_get(result, source_tokens, source))
+            result = _add(result, tokens, value, pointer)
+        elif op == "test":
+            if not _equal(_get(result, tokens, pointer), _member(operation, "value")):
+                raise JsonPatchError(f"Test failed at {pointer}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+    return result
+
+
+def resolve_pointer(document: Any, pointer: str) -> Any:
+    """Значение по JSON Pointer; JsonPatchError, если пути нет"""
+    return _get(document, parse_pointer(pointer), pointer)
+
+
+def format_pointer(tokens: List[Any]) -> str:
+    return "".join("/" + str(token).replace("~", "~0").replace("/", "~1") for token in tokens)
+
+
+def make_patch(source: Any, target: Any) -> List[Dict[str, Any]]:
+    """Строит патч, переводящий source в target.
+
+    Объекты сравниваются по ключам, у массивов отбрасываются общие начало и
+    конец, остальное сравнивается поэлементно. Патч не минимален, но его размер
+    пропорционален изменениям, а не документу.
+    """
+    operations: List[Dict[str, Any]] = []
+    _diff(source, target, [], operations)
+    return operations
+
+
+def _diff(source: Any, target: Any, tokens: List[Any], operations: List[Dict[str, Any]]):
+    if _equal(source, target):
+        return
+    if isinstance(source, dict) and isinstance(target, dict):
+        for key in source:
+            if key not in target:
+                operations.append({"op": "remove", "path": format_pointer(tokens + [key])})
+        for key, value in target.items():
+            if key in source:
+                _diff(source[key], value, tokens + [key], operations)
+            else:
+                operations.append({"op": "add", "path": format_pointer(tokens + [key]), "value": value})
+        return
+    if isinstance(source, list) and isinstance(target, list):
+        start = 0
+        while start < min(len(source), len(target)) and _equal(source[start], target[start]):
+            start += 1
+        end = 0
+        while (end < min(len(source), len(target)) - start
+               and _equal(source[len(source) - 1 - end], target[len(target) - 1 - end])):
+            end += 1
+        source_middle = source[start:len(source) - end]
+        target_middle = target[start:len(target) - end]
+        common = min(len(source_middle), len(target_middle))
+        for offset in range(common):
+            _diff(source_middle[offset], target_middle[offset], tokens + [start + offset], operations)
+        # Лишние элементы удаляются с конца, чтобы индексы не сдвигались
+        for offset in range(len(source_middle) - 1, common - 1, -1):
+            operations.append({"op": "remove", "path": format_pointer(tokens + [start + offset])})
+        for offset in range(common, len(target_middle)):
+            operations.append({
+                "op": "add", "path": format_pointer(tokens + [start + offset]), "value": target_middle[offset]
+            })
+        return
+    operations.append({"op": "replace", "path": format_pointer(tokens), "value": target})
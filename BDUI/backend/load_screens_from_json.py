@@ -1,97 +1,229 @@
 """
-Скрипт для принудительной загрузки экранов из JSON файлов
-Использование: python load_screens_from_json.py
+Скрипт для синхронизации экранов с JSON файлами
+Использование: python load_screens_from_json.py [--watch] [--interval 2]
+
+Манифест (путь, mtime, размер, sha256, имя экрана) хранится рядом с файлами:
+перезаписываются только измененные и новые файлы, экраны удаленных файлов удаляются.
 """
+import argparse
+import asyncio
+import hashlib
 import json
 import os
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from models import Screen
-from database import SessionLocal
+from database import session_scope
+from screen_transfer import (
+    ScreenImport, ScreenImportError, SCREEN_TRANSFER_BATCH_SIZE, parse_screen_document,
+    invalidate_after_import
+)
 
-def load_screens_from_json():
+SCREENS_DIR = Path(os.getenv("SCREENS_DIR", "/screens"))
+SCREEN_SYNC_MANIFEST = Path(os.getenv("SCREEN_SYNC_MANIFEST", str(SCREENS_DIR / ".sync_manifest.json")))
+# Период опроса директории в режиме --watch, секунды
+SCREEN_SYNC_POLL_INTERVAL = float(os.getenv("SCREEN_SYNC_POLL_INTERVAL", "2"))
+
+
+def load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"⚠️  Манифест поврежден, выполняется полная синхронизация: {path}")
+        return {}
+
+
+def save_manifest(path: Path, manifest: Dict[str, Dict[str, Any]]):
+    # Запись через временный файл: прерванная запись не портит манифест
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def apply_isolated(db: Session, items: List[Any], apply: Callable[[List[Any]], None], describe: Callable[[Any], str]) -> List[Any]:
     """
-    Принудительно загружает экраны из JSON файлов
-    Обновляет существующие или создает новые
+    Применяет пачку в точке сохранения; если она падает - по одному элементу,
+    чтобы ошибка одного файла не откатила остальные. Возвращает неудавшиеся элементы
     """
-    db = SessionLocal()
-    
     try:
-        print("🔄 Загружаем экраны из JSON файлов...")
-        
-        screens_dir = Path("/screens")
-        
-        if not screens_dir.exists():
-            print(f"⚠️  Директория screens/ не найдена: {screens_dir}")
-            return False
-        
-        screen_files = list(screens_dir.glob("*.json"))
-        
-        if not screen_files:
-            print("⚠️  JSON файлы не найдены в папке screens/")
-            return False
-        
-        success_count = 0
-        
-        for filepath in screen_files:
-            filename = filepath.name
-            
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                screen_name = data.get('name')
-                if not screen_name:
-                    print(f"⚠️  Некорректный JSON в {filename}: отсутствует 'name'")
-                    continue
-                
-                existing_screen = db.query(Screen).filter(Screen.name == screen_name).first()
-                
-                if existing_screen:
-                    existing_screen.title = data.get('title', existing_screen.title)
-                    existing_screen.description = data.get('description', existing_screen.description)
-                    existing_screen.config = data.get('config', existing_screen.config)
-                    existing_screen.platform = data.get('platform', existing_screen.platform)
-                    existing_screen.locale = data.get('locale', existing_screen.locale)
-                    existing_screen.is_active = data.get('is_active', existing_screen.is_active)
-                    
-                    db.commit()
-                    print(f"🔄 Обновлен: {screen_name}")
-                else:
-                    screen = Screen(
-                        name=screen_name,
-                        title=data.get('title', ''),
-                        description=data.get('description', ''),
-                        config=data.get('config', {}),
-                        platform=data.get('platform', 'web'),
-                        locale=data.get('locale', 'ru'),
-                        is_active=data.get('is_active', True)
-                    )
-                    
-                    db.add(screen)
-                    db.commit()
-                    print(f"✅ Создан: {screen_name}")
-                
-                success_count += 1
-                
-            except json.JSONDecodeError as e:
-                print(f"❌ Ошибка парсинга JSON в {filename}: {e}")
-            except Exception as e:
-                print(f"❌ Ошибка при обработке {filename}: {e}")
-                db.rollback()
-        
-        if success_count > 0:
-            print(f"🎉 Успешно обработано {success_count} экран(ов)!")
-            return True
+        with db.begin_nested():
+            apply(items)
+        return []
+    except Exception as e:
+        if len(items) == 1:
+            print(f"❌ {describe(items[0])}: {e}")
+            return items
+    failed = []
+    for item in items:
+        try:
+            with db.begin_nested():
+                apply([item])
+        except Exception as e:
+            print(f"❌ {describe(item)}: {e}")
+            failed.append(item)
+    return failed
+
+
+def sync_screens(
+    screens_dir: Path = SCREENS_DIR,
+    manifest_path: Path = SCREEN_SYNC_MANIFEST
+) -> Optional[ScreenImport]:
+    """
+    Применяет к базе изменения файлов с прошлой синхронизации одной транзакцией.
+    Файлы с прежними mtime и размером не читаются, с прежним хэшем - не пишутся в базу.
+    Файл, который не удалось разобрать или записать, пропускается: его запись в манифесте
+    остается прежней, и он повторяется при следующей синхронизации.
+    Возвращает результат для инвалидации кэша или None, если менять нечего
+    """
+    manifest = load_manifest(manifest_path)
+    new_manifest = {}
+    # (имя файла, строка экрана) для записи в базу
+    changed: List[Tuple[str, Dict[str, Any]]] = []
+
+    def skip_file(filename: str):
+        if filename in manifest:
+            new_manifest[filename] = manifest[filename]
         else:
-            print("⚠️  Не удалось обработать ни одного экрана")
+            new_manifest.pop(filename, None)
+
+    for filepath in sorted(screens_dir.glob("*.json")):
+        if filepath.name.startswith("."):
+            # Скрытые файлы, в том числе сам манифест, - не экраны
+            continue
+        stat = filepath.stat()
+        entry = manifest.get(filepath.name)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            new_manifest[filepath.name] = entry
+            continue
+
+        content = filepath.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        if entry and entry["sha256"] == digest:
+            # Файл тронут, но не изменен (touch, checkout) - обновляем только mtime
+            new_manifest[filepath.name] = {**entry, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            continue
+
+        try:
+            row = parse_screen_document(filepath.name, content)
+        except ScreenImportError as e:
+            # Файл мог быть сохранен наполовину - повторим на следующей синхронизации
+            print(f"❌ Ошибка в JSON файле, файл пропущен: {e}")
+            skip_file(filepath.name)
+            continue
+        changed.append((filepath.name, row))
+        new_manifest[filepath.name] = {
+            "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "name": row["name"]
+        }
+
+    def removed_names() -> List[str]:
+        # Экран удаляется, только если его имя больше не встречается ни в одном файле
+        # (файл мог быть переименован или имя перенесено в другой файл)
+        current_names = {entry["name"] for entry in new_manifest.values()}
+        return sorted({entry["name"] for entry in manifest.values()} - current_names)
+
+    result = None
+    if changed or removed_names():
+        result = ScreenImport()
+        with session_scope() as db:
+            for start in range(0, len(changed), SCREEN_TRANSFER_BATCH_SIZE):
+                failed = apply_isolated(
+                    db, changed[start:start + SCREEN_TRANSFER_BATCH_SIZE],
+                    lambda items: result.upsert(db, [row for _, row in items]),
+                    lambda item: f"Не удалось записать экран из {item[0]}"
+                )
+                for filename, _ in failed:
+                    skip_file(filename)
+            # Удаляемые имена - после записи: файл, который не удалось записать, вернул
+            # прежнюю запись манифеста, и его прежний экран остается
+            removed = removed_names()
+            if removed:
+                failed = apply_isolated(
+                    db, removed, lambda names: result.delete(db, names),
+                    lambda name: f"Не удалось удалить экран {name}"
+                )
+                # Записи удаленных файлов остаются в манифесте - удаление повторится
+                new_manifest.update(
+                    (filename, entry) for filename, entry in manifest.items()
+                    if entry["name"] in failed and filename not in new_manifest
+                )
+            db.commit()
+
+    if new_manifest != manifest:
+        save_manifest(manifest_path, new_manifest)
+    return result
+
+
+def report(result: Optional[ScreenImport]):
+    if result is None:
+        print("✅ Экраны актуальны, изменений нет")
+    else:
+        print(f"🎉 Синхронизировано: создано {result.created}, обновлено {result.updated}, "
+              f"удалено {result.deleted}")
+
+
+def load_screens_from_json():
+    """
+    Синхронизирует экраны с JSON файлами: создает, обновляет и удаляет только
+    затронутые изменениями файлов экраны и инвалидирует их ключи кэша
+    """
+    try:
+        print("🔄 Синхронизируем экраны с JSON файлами...")
+
+        if not SCREENS_DIR.exists():
+            print(f"⚠️  Директория screens/ не найдена: {SCREENS_DIR}")
             return False
-            
+
+        result = sync_screens()
+        if result is not None:
+            asyncio.run(invalidate_after_import(result))
+        report(result)
+        return True
+
+    except ScreenImportError as e:
+        print(f"❌ Ошибка в JSON файле, изменения не сохранены: {e}")
+        return False
     except Exception as e:
         print(f"❌ Ошибка при загрузке экранов: {e}")
         return False
+
+
+async def watch_screens(interval: float = SCREEN_SYNC_POLL_INTERVAL):
+    """Опрашивает директорию и применяет правки сразу после сохранения файла"""
+    from routers.screens import invalidate_imported_screens
+    from cache import redis_client
+
+    print(f"👀 Отслеживаем изменения в {SCREENS_DIR} (каждые {interval:g} с)")
+    try:
+        while True:
+            try:
+                result = await asyncio.to_thread(sync_screens)
+                if result is not None:
+                    await invalidate_imported_screens(result)
+                    report(result)
+            except ScreenImportError as e:
+                # Файл мог быть сохранен наполовину - повторим на следующем опросе
+                print(f"❌ Ошибка в JSON файле, изменения не сохранены: {e}")
+            except Exception as e:
+                print(f"❌ Ошибка синхронизации экранов: {e}")
+            await asyncio.sleep(interval)
     finally:
-        db.close()
+        await redis_client.aclose()
+
 
 if __name__ == "__main__":
-    load_screens_from_json()
+    parser = argparse.ArgumentParser(description="Синхронизация экранов с JSON файлами")
+    parser.add_argument("--watch", action="store_true", help="следить за директорией и применять правки")
+    parser.add_argument("--interval", type=float, default=SCREEN_SYNC_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    if args.watch:
+        try:
+            asyncio.run(watch_screens(args.interval))
+        except KeyboardInterrupt:
+            pass
+    else:
+        load_screens_from_json()
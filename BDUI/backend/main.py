@@ -7,9 +7,11 @@ import redis
 from database import engine, get_db
 from models import Base
 from routers import screens, components, analytics, ab_testing, templates, performance
-from cache import redis_client
+from cache import cache, redis_client, circuit_breaker
 from websocket_manager import manager
 from init_screens import init_screens_from_json
+from cache_warmup import CACHE_WARMUP_ENABLED, warm_up_within_budget
+from screen_resolver import routing_index
 
 
 @asynccontextmanager
@@ -22,7 +24,17 @@ async def lifespan(app: FastAPI):
     init_screens_from_json()
     print("="*60 + "\n")
     
+    cache.start_invalidation_listener()
+    routing_index.start()
+    
+    if CACHE_WARMUP_ENABLED:
+        await warm_up_within_budget()
+    
     yield
+    
+    await routing_index.stop()
+    await cache.stop_invalidation_listener()
+    await redis_client.aclose()
 
 
 app = FastAPI(
@@ -63,11 +75,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    # PING идет мимо предохранителя, чтобы проверка видела реальное состояние Redis
     try:
-        redis_client.ping()
-        return {"status": "healthy", "database": "connected", "cache": "connected"}
+        await redis_client.ping()
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "cache": "connected",
+            "cache_circuit": circuit_breaker.state,
+        }
     except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+        return {"status": "unhealthy", "error": str(e), "cache_circuit": circuit_breaker.state}
 
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -22,6 +22,39 @@ class Screen(Base):
     
     analytics = relationship("Analytics", back_populates="screen")
     ab_tests = relationship("ABTest", back_populates="screen")
+    versions = relationship("ScreenVersion", back_populates="screen", passive_deletes=True)
+    
+    __table_args__ = (
+        # Разрешение экрана по имени с fallback по локали (screen_resolver)
+        Index("ix_screens_name_platform_locale_active", "name", "platform", "locale", "is_active"),
+    )
+
+
+class ScreenVersion(Base):
+    """История config экрана: полный снимок раз в N версий, между ними - JSON Patch от предыдущей"""
+    __tablename__ = "screen_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    screen_id = Column(Integer, ForeignKey("screens.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = Column(JSON)  # config для снимка, список операций для дельты
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    screen = relationship("Screen", back_populates="versions")
+    
+    __table_args__ = (
+        Index("ix_screen_versions_screen_version", "screen_id", "version", unique=True),
+    )
+
+
+class ConfigBlob(Base):
+    """Поддерево config по sha256 (config_store): общее для экранов, шаблонов и снимков версий"""
+    __tablename__ = "config_blobs"
+    
+    hash = Column(String(64), primary_key=True)
+    data = Column(Text, nullable=False)  # JSON поддерева, вложенные блобы - ссылками {"$blob": hash}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class Component(Base):
@@ -0,0 +1,120 @@
+import hashlib
+import inspect
+import orjson
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Union
+from fastapi import Response
+from cache import cache
+
+# Длина hex-представления хэша содержимого
+CONTENT_HASH_LENGTH = 32
+# Запись кэша: "<etag>\n<тело>"; orjson не выдает переводов строк, поэтому
+# первый \n всегда завершает заголовок. Длина заголовка ограничена сверху
+ETAG_HEADER_MAX_LENGTH = 96
+
+
+class CachedJSON(NamedTuple):
+    """Готовое к отправке JSON-тело ответа и его ETag (без кавычек)"""
+    body: bytes
+    etag: str
+
+
+def encode_json(value: Any) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=CONTENT_HASH_LENGTH // 2).hexdigest()
+
+
+def pack_json(value: Any, tag: Optional[str] = None) -> bytes:
+    """Кодирует значение в запись кэша: ETag + JSON-тело.
+
+    ETag - хэш тела; ``tag`` (например, ``<id>-<version>`` экрана) ставится перед ним.
+    """
+    body = encode_json(value)
+    etag = f"{tag}-{content_hash(body)}" if tag else content_hash(body)
+    return etag.encode() + b"\n" + body
+
+
+def unpack_json(data: Any) -> Optional[CachedJSON]:
+    """Запись кэша или None, если под ключом значение другого формата (например, JSON прежних версий)"""
+    if not isinstance(data, bytes):
+        return None
+    etag, _, body = data.partition(b"\n")
+    return CachedJSON(body, etag.decode())
+
+
+def quote_etag(etag: str) -> str:
+    return f'"{etag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка If-None-Match (список ETag через запятую или *)"""
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or quote_etag(etag) in candidates
+
+
+async def cached_etag(key: str) -> Optional[str]:
+    """ETag записи по первым байтам значения, без чтения и разбора тела"""
+    prefix = await cache.get_prefix(key, ETAG_HEADER_MAX_LENGTH + 1)
+    if prefix is None:
+        return None
+    etag, sep, _ = prefix.partition(b"\n")
+    return etag.decode() if sep else None
+
+
+async def get_or_compute_json(
+    key: str,
+    loader: Callable[[], Union[Any, Awaitable[Any]]],
+    ttl: int = 3600,
+    soft_ttl: Optional[int] = None,
+    tag: Optional[Callable[[Any], str]] = None,
+) -> CachedJSON:
+    """Как ``cache.get_or_compute``, но хранит уже сериализованное тело ответа.
+
+    При промахе значение ``loader`` кодируется orjson один раз, а при попадании
+    байты отдаются как есть, без разбора JSON и Pydantic-валидации.
+    """
+    def pack(value: Any) -> bytes:
+        return pack_json(value, tag(value) if tag else None)
+
+    # Синхронный загрузчик вместе с кодированием уходит в пул потоков (cache.run_loader)
+    if inspect.iscoroutinefunction(loader):
+        async def load_packed():
+            return pack(await loader())
+    else:
+        def load_packed():
+            return pack(loader())
+
+    entry = unpack_json(await cache.get_or_compute(key, load_packed, ttl=ttl, soft_ttl=soft_ttl))
+    if entry is None:
+        # Значение не в формате записи - считаем промахом и пересчитываем
+        await cache.delete(key)
+        entry = unpack_json(await cache.get_or_compute(key, load_packed, ttl=ttl, soft_ttl=soft_ttl))
+    return entry
+
+
+async def cached_json_response(
+    key: str,
+    loader: Callable[[], Union[Any, Awaitable[Any]]],
+    ttl: int = 3600,
+    soft_ttl: Optional[int] = None,
+    tag: Optional[Callable[[Any], str]] = None,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """JSON-ответ из кэша с ETag; при совпадении If-None-Match - 304 без тела.
+
+    Если запись уже есть в кэше, ETag сверяется по ее заголовку, не загружая тело.
+    """
+    if if_none_match:
+        etag = await cached_etag(key)
+        if etag is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": quote_etag(etag)})
+
+    entry = await get_or_compute_json(key, loader, ttl=ttl, soft_ttl=soft_ttl, tag=tag)
+    headers = {"ETag": quote_etag(entry.etag)}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-import hashlib
 import random
 from database import get_db
 from models import ABTest as ABTestModel, Screen as ScreenModel
 from schemas import ABTest, ABTestCreate, ABTestUpdate
 from cache import cache
+from response_cache import cached_json_response
+from screen_resolver import resolve_screen_id
+from screen_materializer import (
+    RESOLVED_SCREEN_TTL, assignment_key, resolved_key, build_assignment, build_payload,
+    choose_variant, active_test, materialize_screens
+)
 
 router = APIRouter()
 
@@ -54,7 +59,7 @@ async def create_ab_test(
     db.commit()
     db.refresh(db_test)
     
-    background_tasks.add_task(invalidate_ab_test_cache)
+    background_tasks.add_task(invalidate_ab_test_cache, db_test.screen_id)
     
     return ABTest.from_orm(db_test)
 
@@ -71,6 +76,7 @@ async def update_ab_test(
         raise HTTPException(status_code=404, detail="A/B test not found")
     
     update_data = test_update.dict(exclude_unset=True)
+    old_screen_id = db_test.screen_id
     
     for field, value in update_data.items():
         setattr(db_test, field, value)
@@ -78,7 +84,7 @@ async def update_ab_test(
     db.commit()
     db.refresh(db_test)
     
-    background_tasks.add_task(invalidate_ab_test_cache)
+    background_tasks.add_task(invalidate_ab_test_cache, old_screen_id, db_test.screen_id)
     
     return ABTest.from_orm(db_test)
 
@@ -93,10 +99,11 @@ async def delete_ab_test(
     if not db_test:
         raise HTTPException(status_code=404, detail="A/B test not found")
     
+    screen_id = db_test.screen_id
     db.delete(db_test)
     db.commit()
     
-    background_tasks.add_task(invalidate_ab_test_cache)
+    background_tasks.add_task(invalidate_ab_test_cache, screen_id)
     
     return {"message": "A/B test deleted successfully"}
 
@@ -118,7 +125,7 @@ async def activate_ab_test(
     db.commit()
     db.refresh(db_test)
     
-    background_tasks.add_task(invalidate_ab_test_cache)
+    background_tasks.add_task(invalidate_ab_test_cache, db_test.screen_id)
     
     return {"message": "A/B test activated successfully"}
 
@@ -140,7 +147,7 @@ async def deactivate_ab_test(
     db.commit()
     db.refresh(db_test)
     
-    background_tasks.add_task(invalidate_ab_test_cache)
+    background_tasks.add_task(invalidate_ab_test_cache, db_test.screen_id)
     
     return {"message": "A/B test deactivated successfully"}
 
@@ -152,88 +159,43 @@ async def get_screen_variant(
     session_id: Optional[str] = None,
     platform: str = "web",
     locale: str = "ru",
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     # First, find the screen by identifier (could be ID or name)
-    screen = None
     if screen_identifier.isdigit():
         # If identifier is numeric, treat as ID
-        screen = db.query(ScreenModel).filter(ScreenModel.id == int(screen_identifier)).first()
+        screen_id = int(screen_identifier)
     else:
-        # Otherwise, treat as name - try exact match first
-        screen = db.query(ScreenModel).filter(
-            ScreenModel.name == screen_identifier,
-            ScreenModel.platform == platform,
-            ScreenModel.locale == locale,
-            ScreenModel.is_active == True
-        ).first()
-        
-        # If not found and locale is 'en', try with _en suffix
-        if not screen and locale == 'en':
-            screen = db.query(ScreenModel).filter(
-                ScreenModel.name == f"{screen_identifier}_en",
-                ScreenModel.platform == platform,
-                ScreenModel.locale == locale,
-                ScreenModel.is_active == True
-            ).first()
-        
-        # If still not found, try fallback to Russian version
-        if not screen:
-            screen = db.query(ScreenModel).filter(
-                ScreenModel.name == screen_identifier,
-                ScreenModel.platform == platform,
-                ScreenModel.locale == "ru",
-                ScreenModel.is_active == True
-            ).first()
+        # Otherwise, treat as name with locale fallback (misses are cached too)
+        screen_id = await resolve_screen_id(db, screen_identifier, platform, locale)
     
-    if not screen:
+    if screen_id is None:
         raise HTTPException(status_code=404, detail="Screen not found")
     
-    cache_key = f"ab_variant:{screen.id}:{user_id}:{session_id}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    active_test = db.query(ABTestModel).filter(
-        ABTestModel.screen_id == screen.id,
-        ABTestModel.is_active == True
-    ).first()
-    
-    if not active_test:
-        result = {
-            "variant": "control",
-            "config": screen.config,
-            "test_id": None
-        }
-    else:
-        identifier = user_id or session_id or str(random.random())
-        hash_value = int(hashlib.md5(f"{active_test.id}:{identifier}".encode()).hexdigest(), 16)
-        
-        if (hash_value % 100) / 100 < active_test.traffic_allocation:
-            variant_keys = list(active_test.variants.keys())
-            variant_index = hash_value % len(variant_keys)
-            variant_key = variant_keys[variant_index]
-            
-            result = {
-                "variant": variant_key,
-                "config": active_test.variants[variant_key],
-                "test_id": active_test.id
-            }
-        else:
-            result = {
-                "variant": "control",
-                "config": screen.config,
-                "test_id": active_test.id
-            }
+    # Ответы материализуются при изменении экрана или теста (screen_materializer):
+    # здесь только выбор варианта и готовые байты из кэша, БД - лишь при промахе
+    def load_assignment():
+        if db.query(ScreenModel.id).filter(ScreenModel.id == screen_id).first() is None:
+            raise HTTPException(status_code=404, detail="Screen not found")
+        return build_assignment(active_test(db, screen_id))
     
-    await cache.set(cache_key, result, ttl=3600)
-    return result
-
-
-async def invalidate_ab_test_cache():
-    await cache.invalidate_pattern("ab_variant:*")
-
-
-
+    assignment = await cache.get_or_compute(assignment_key(screen_id), load_assignment, ttl=RESOLVED_SCREEN_TTL)
+    
+    identifier = user_id or session_id or str(random.random())
+    variant = choose_variant(assignment, identifier)
+    
+    def load_payload():
+        screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
+        if not screen:
+            raise HTTPException(status_code=404, detail="Screen not found")
+        return build_payload(screen, active_test(db, screen_id), variant)
+    
+    return await cached_json_response(
+        resolved_key(screen_id, variant), load_payload, ttl=RESOLVED_SCREEN_TTL, if_none_match=if_none_match
+    )
 
 
+async def invalidate_ab_test_cache(*screen_ids: int):
+    """Пересчитывает материализованные ответы экранов, к которым относится тест"""
+    await materialize_screens(screen_id for screen_id in screen_ids if screen_id is not None)
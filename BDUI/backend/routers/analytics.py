@@ -4,10 +4,11 @@ from sqlalchemy import func, desc
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import json
-from database import get_db
+from database import get_db, session_scope
 from models import Analytics as AnalyticsModel, Screen as ScreenModel
 from schemas import Analytics, AnalyticsEvent, AnalyticsStats
 from cache import cache
+from response_cache import cached_json_response
 
 def count_all_components(components):
     """
@@ -25,6 +26,10 @@ def count_all_components(components):
 
 router = APIRouter()
 
+# После ANALYTICS_CACHE_SOFT_TTL агрегаты отдаются из кэша и пересчитываются в фоне
+ANALYTICS_CACHE_SOFT_TTL = 300
+ANALYTICS_CACHE_TTL = 3600
+
 
 @router.post("/track")
 async def track_event(
@@ -91,29 +96,34 @@ async def get_analytics_events_count(
 
 
 @router.get("/stats/{screen_id}", response_model=AnalyticsStats)
-async def get_screen_stats(
-    screen_id: int,
-    days: int = 7,
-    db: Session = Depends(get_db)
-):
+async def get_screen_stats(screen_id: int, days: int = 7):
     cache_key = f"stats:{screen_id}:{days}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        # Добавляем active_components_count для старых кэшированных данных
-        if 'active_components_count' not in cached_result:
-            # Получаем общее количество компонентов в экране (включая вложенные)
-            screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
-            total_components_count = 0
-            if screen and screen.config:
-                try:
-                    config_data = screen.config if isinstance(screen.config, dict) else json.loads(screen.config)
-                    components = config_data.get('components', [])
-                    total_components_count = count_all_components(components)
-                except:
-                    total_components_count = 0
-            cached_result['active_components_count'] = total_components_count
-        return AnalyticsStats(**cached_result)
     
+    # Загрузчик открывает свою сессию: он же выполняется при фоновом обновлении
+    def load_stats():
+        with session_scope() as db:
+            return compute_screen_stats(db, screen_id, days)
+    
+    return await cached_json_response(
+        cache_key, load_stats, ttl=ANALYTICS_CACHE_TTL, soft_ttl=ANALYTICS_CACHE_SOFT_TTL
+    )
+
+
+@router.get("/overview")
+async def get_analytics_overview(days: int = 7):
+    cache_key = f"analytics_overview:{days}"
+    
+    def load_overview():
+        with session_scope() as db:
+            return compute_analytics_overview(db, days)
+    
+    return await cached_json_response(
+        cache_key, load_overview, ttl=ANALYTICS_CACHE_TTL, soft_ttl=ANALYTICS_CACHE_SOFT_TTL
+    )
+
+
+def compute_screen_stats(db: Session, screen_id: int, days: int) -> Dict[str, Any]:
+    """Агрегирует статистику экрана за последние ``days`` дней"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
     query = db.query(AnalyticsModel).filter(
@@ -191,17 +201,11 @@ async def get_screen_stats(
         locale_breakdown=locale_breakdown
     )
     
-    await cache.set(cache_key, stats.dict(), ttl=300)
-    return stats
+    return stats.dict()
 
 
-@router.get("/overview")
-async def get_analytics_overview(days: int = 7, db: Session = Depends(get_db)):
-    cache_key = f"analytics_overview:{days}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
+def compute_analytics_overview(db: Session, days: int) -> Dict[str, Any]:
+    """Агрегирует общую статистику по всем экранам за последние ``days`` дней"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
     total_events = db.query(AnalyticsModel).filter(
@@ -257,13 +261,13 @@ async def get_analytics_overview(days: int = 7, db: Session = Depends(get_db)):
         ]
     }
     
-    await cache.set(cache_key, result, ttl=300)
     return result
 
 
 async def invalidate_analytics_cache():
-    await cache.invalidate_pattern("stats:*")
-    await cache.invalidate_pattern("analytics_overview:*")
+    # Новые события лишь помечают агрегаты устаревшими, пересчет идет в фоне
+    await cache.invalidate_namespace("stats", soft=True)
+    await cache.invalidate_namespace("analytics_overview", soft=True)
 
 
 
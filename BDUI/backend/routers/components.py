@@ -5,6 +5,7 @@ from database import get_db
 from models import Component as ComponentModel
 from schemas import Component, ComponentCreate, ComponentUpdate
 from cache import cache
+from response_cache import cached_json_response
 
 router = APIRouter()
 
@@ -16,38 +17,31 @@ async def get_components(
     db: Session = Depends(get_db)
 ):
     cache_key = f"components:{category}:{component_type}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return [Component(**comp) for comp in cached_result]
     
-    query = db.query(ComponentModel)
+    def load_components():
+        query = db.query(ComponentModel)
+        
+        if category:
+            query = query.filter(ComponentModel.category == category)
+        if component_type:
+            query = query.filter(ComponentModel.type == component_type)
+        
+        return [Component.from_orm(component).dict() for component in query.all()]
     
-    if category:
-        query = query.filter(ComponentModel.category == category)
-    if component_type:
-        query = query.filter(ComponentModel.type == component_type)
-    
-    components = query.all()
-    result = [Component.from_orm(component) for component in components]
-    
-    await cache.set(cache_key, [comp.dict() for comp in result])
-    return result
+    return await cached_json_response(cache_key, load_components)
 
 
 @router.get("/{component_id}", response_model=Component)
 async def get_component(component_id: int, db: Session = Depends(get_db)):
     cache_key = f"component:{component_id}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return Component(**cached_result)
     
-    component = db.query(ComponentModel).filter(ComponentModel.id == component_id).first()
-    if not component:
-        raise HTTPException(status_code=404, detail="Component not found")
+    def load_component():
+        component = db.query(ComponentModel).filter(ComponentModel.id == component_id).first()
+        if not component:
+            raise HTTPException(status_code=404, detail="Component not found")
+        return Component.from_orm(component).dict()
     
-    result = Component.from_orm(component)
-    await cache.set(cache_key, result.dict())
-    return result
+    return await cached_json_response(cache_key, load_component)
 
 
 @router.post("/", response_model=Component)
@@ -117,22 +111,19 @@ async def delete_component(
 
 @router.get("/categories/list")
 async def get_component_categories(db: Session = Depends(get_db)):
-    cache_key = "component_categories"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return cached_result
+    # В пространстве components: сбрасывается вместе со списками компонентов
+    cache_key = "components:categories"
     
-    categories = db.query(ComponentModel.category).distinct().all()
-    result = [cat[0] for cat in categories if cat[0]]
+    def load_categories():
+        categories = db.query(ComponentModel.category).distinct().all()
+        return [cat[0] for cat in categories if cat[0]]
     
-    await cache.set(cache_key, result)
-    return result
+    return await cached_json_response(cache_key, load_categories)
 
 
 async def invalidate_component_cache():
-    await cache.invalidate_pattern("component:*")
-    await cache.invalidate_pattern("components:*")
-    await cache.delete("component_categories")
+    await cache.invalidate_namespace("component")
+    await cache.invalidate_namespace("components")
 
 
 
@@ -4,7 +4,9 @@ from sqlalchemy import func, desc
 from typing import List, Optional
 from database import get_db
 from models import PerformanceMetric
+from cache import cache
 from datetime import datetime, timedelta
+import os
 
 router = APIRouter()
 
@@ -132,3 +134,20 @@ async def get_recent_metrics(
         ]
     }
 
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    Получить статистику кэша текущего воркера: попадания, промахи, ошибки,
+    объем данных и гистограммы задержек по семействам ключей
+    """
+    return {"pid": os.getpid(), **cache.stats()}
+
+
+@router.post("/cache/reset")
+async def reset_cache_stats():
+    """
+    Сбросить счетчики кэша текущего воркера
+    """
+    cache.metrics.reset()
+    return {"message": "Cache metrics reset"}
@@ -1,61 +1,256 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional, Dict, Any, Iterable, Tuple, Union
+from database import get_db, session_scope
 from models import Screen as ScreenModel, Template as TemplateModel, PerformanceMetric
-from schemas import Screen, ScreenCreate, ScreenUpdate
+from schemas import Screen, ScreenFields, ScreenPage, ScreenCreate, ScreenUpdate, ScreenPatch, ScreenComponentUpdate, BulkScreensFromTemplate
 from cache import cache
+from response_cache import CachedJSON, cached_json_response, get_or_compute_json, content_hash, etag_matches, quote_etag
+from screen_resolver import resolve_screen_id, invalidate_resolution, publish_screen_routes
+from screen_materializer import materialize_screens
+from screen_streaming import (
+    SCREEN_STREAM_MODES, SCREEN_STREAM_FIRST_COMPONENTS, SCREEN_STREAM_CHUNK_COMPONENTS,
+    stream_screen_response, components_page
+)
 from websocket_manager import manager
-import hashlib
+from json_patch import apply_patch, make_patch, resolve_pointer, JsonPatchError
+from component_index import get_component_index
+from screen_history import record_version, list_versions, get_version_config
+from config_store import store_config, load_config
+from template_renderer import compile_template, get_template_plan
+from screen_transfer import (
+    ScreenImport, iter_ndjson_export, iter_tar_export, iter_ndjson_documents, iter_tar_documents,
+    iter_screen_rows
+)
+from collections import Counter
+from datetime import datetime
+import asyncio
 import json
-import re
+import orjson
+import tempfile
 import time
 
 router = APIRouter()
 
+SCREEN_CACHE_TTL = 24 * 3600
+SCREEN_CACHE_SOFT_TTL = 3600
 
-@router.get("/", response_model=List[Screen])
+SCREEN_PAGE_DEFAULT_LIMIT = 50
+SCREEN_PAGE_MAX_LIMIT = 500
+# Поля для списков в админке: все, кроме config
+SCREEN_SUMMARY_FIELDS = (
+    "id", "name", "title", "description", "platform", "locale",
+    "version", "is_active", "created_at", "updated_at",
+)
+
+# Тело импорта до этого размера держится в памяти, больше - во временном файле
+SCREEN_IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+@router.get("/", response_model=Union[List[Screen], List[ScreenFields], ScreenPage])
 async def get_screens(
     platform: Optional[str] = None,
     locale: Optional[str] = None,
     is_active: Optional[bool] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=SCREEN_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    cache_key = f"screens:{platform}:{locale}:{is_active}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    query = db.query(ScreenModel)
-    
-    if platform:
-        query = query.filter(ScreenModel.platform == platform)
-    if locale:
-        query = query.filter(ScreenModel.locale == locale)
-    if is_active is not None:
-        query = query.filter(ScreenModel.is_active == is_active)
+    """
+    Список экранов. С fields (через запятую или "summary") выбираются только
+    нужные колонки; с limit/cursor ответ постраничный: {"items", "next_cursor"}
+    """
+    selected = parse_screen_fields(fields)
+    paginated = limit is not None or cursor is not None
+    after_id = parse_screen_cursor(cursor)
+    page_size = limit or SCREEN_PAGE_DEFAULT_LIMIT
     
-    screens = query.all()
-    result = [Screen.from_orm(screen) for screen in screens]
+    cache_key = f"screens:{platform}:{locale}:{is_active}"
+    if selected is not None:
+        cache_key += f":fields={','.join(selected)}"
+    if paginated:
+        cache_key += f":after={after_id}:limit={page_size}"
     
-    await cache.set(cache_key, [screen.dict() for screen in result])
-    return result
+    def load_screens():
+        query = db.query(ScreenModel)
+        
+        if platform:
+            query = query.filter(ScreenModel.platform == platform)
+        if locale:
+            query = query.filter(ScreenModel.locale == locale)
+        if is_active is not None:
+            query = query.filter(ScreenModel.is_active == is_active)
+        if selected is not None:
+            query = query.options(load_only(*[getattr(ScreenModel, field) for field in selected]))
+        
+        if not paginated:
+            return [serialize_screen(screen, selected) for screen in query.all()]
+        
+        # Keyset-пагинация по id: стоимость страницы не зависит от ее номера
+        if after_id is not None:
+            query = query.filter(ScreenModel.id > after_id)
+        screens = query.order_by(ScreenModel.id).limit(page_size + 1).all()
+        has_more = len(screens) > page_size
+        screens = screens[:page_size]
+        return {
+            "items": [serialize_screen(screen, selected) for screen in screens],
+            "next_cursor": str(screens[-1].id) if has_more else None,
+        }
+    
+    return await cached_json_response(cache_key, load_screens)
+
+
+def parse_screen_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    if fields == "summary":
+        return list(SCREEN_SUMMARY_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in Screen.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id нужен для курсора и ссылок на экран
+    return ["id"] + sorted(set(selected) - {"id"})
+
+
+def parse_screen_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+    if not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return int(cursor)
+
+
+def serialize_screen(screen: ScreenModel, selected: Optional[List[str]]) -> Dict[str, Any]:
+    if selected is None:
+        return Screen.from_orm(screen).dict()
+    return {field: getattr(screen, field) for field in selected}
+
+
+def screen_tag(screen: Dict[str, Any]) -> str:
+    """Часть ETag экрана перед хэшем содержимого"""
+    return f"{screen['id']}-{screen['version']}"
+
+
+@router.get("/export")
+async def export_screens(format: str = Query("ndjson", pattern="^(ndjson|tar)$")):
+    """
+    Выгружает все экраны потоком: NDJSON или tar.gz с файлом на экран
+    """
+    if format == "tar":
+        return StreamingResponse(
+            iter_tar_export(), media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="screens.tar.gz"'}
+        )
+    return StreamingResponse(
+        iter_ndjson_export(), media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="screens.ndjson"'}
+    )
+
+
+@router.post("/import")
+async def import_screens(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: str = Query("ndjson", pattern="^(ndjson|tar)$")
+):
+    """
+    Импортирует экраны (upsert по имени) в одной транзакции.
+    В ответ идет NDJSON: прогресс после каждой пачки и итоговая строка со status
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SCREEN_IMPORT_SPOOL_SIZE)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    
+    result = ScreenImport()
+    documents = iter_tar_documents(spool) if format == "tar" else iter_ndjson_documents(spool)
+    
+    def events():
+        try:
+            with session_scope() as db:
+                for processed in result.run(db, iter_screen_rows(documents)):
+                    yield json.dumps({"processed": processed}) + "\n"
+                db.commit()
+            yield json.dumps({"status": "ok", **result.summary()}) + "\n"
+        except Exception as e:
+            # Транзакция откатилась - инвалидировать нечего
+            result.changes.clear()
+            print(f"❌ Ошибка импорта экранов: {e}")
+            yield json.dumps({"status": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            spool.close()
+    
+    # Фоновые задачи выполняются после отправки всего ответа, то есть после commit
+    background_tasks.add_task(invalidate_imported_screens, result)
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=background_tasks)
 
 
 @router.get("/{screen_id}", response_model=Screen)
-async def get_screen(screen_id: int, db: Session = Depends(get_db)):
-    cache_key = f"screen:{screen_id}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return Screen(**cached_result)
-    
+async def get_screen(
+    screen_id: int,
+    stream: Optional[str] = Query(None, pattern=SCREEN_STREAM_MODES),
+    first: int = Query(SCREEN_STREAM_FIRST_COMPONENTS, ge=0),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    С stream=ndjson экран приходит потоком: заголовок с первыми first компонентами,
+    затем порции остальных; с stream=cursor - заголовок и курсор для /{id}/components
+    """
+    return await screen_response(screen_id, stream, first, if_none_match)
+
+
+@router.get("/{screen_id}/components")
+async def get_screen_components(
+    screen_id: int,
+    cursor: str,
+    limit: int = Query(SCREEN_STREAM_CHUNK_COMPONENTS, ge=1, le=SCREEN_PAGE_MAX_LIMIT)
+):
+    """
+    Продолжение экрана, полученного с stream=cursor: следующие limit компонентов
+    """
+    entry = await get_screen_entry(screen_id)
+    return components_page(orjson.loads(entry.body), cursor, limit)
+
+
+def load_screen_data(db: Session, screen_id: int) -> Dict[str, Any]:
     screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
     if not screen:
         raise HTTPException(status_code=404, detail="Screen not found")
-    
-    result = Screen.from_orm(screen)
-    await cache.set(cache_key, result.dict())
-    return result
+    return Screen.from_orm(screen).dict()
+
+
+def screen_loader(screen_id: int):
+    # Своя сессия: при stale-while-revalidate загрузчик выполняется уже после запроса;
+    # синхронный загрузчик cache.run_loader выполняет в пуле потоков
+    def load_screen():
+        with session_scope() as db:
+            return load_screen_data(db, screen_id)
+    return load_screen
+
+
+async def get_screen_entry(screen_id: int) -> CachedJSON:
+    """Запись screen:{id} - общая для экрана по id, по имени, его компонентов и поддеревьев"""
+    return await get_or_compute_json(
+        f"screen:{screen_id}", screen_loader(screen_id),
+        ttl=SCREEN_CACHE_TTL, soft_ttl=SCREEN_CACHE_SOFT_TTL, tag=screen_tag
+    )
+
+
+async def screen_response(
+    screen_id: int, stream: Optional[str], first: int, if_none_match: Optional[str]
+) -> Response:
+    if stream:
+        entry = await get_screen_entry(screen_id)
+        return stream_screen_response(entry, stream, first, if_none_match=if_none_match)
+    
+    # Запись сбрасывается при изменении экрана; soft_ttl лишь убирает ожидание БД при истечении TTL
+    return await cached_json_response(
+        f"screen:{screen_id}", screen_loader(screen_id),
+        ttl=SCREEN_CACHE_TTL, soft_ttl=SCREEN_CACHE_SOFT_TTL, tag=screen_tag, if_none_match=if_none_match
+    )
 
 
 @router.get("/by-name/{screen_name}")
@@ -63,45 +258,21 @@ async def get_screen_by_name(
     screen_name: str,
     platform: str = "web",
     locale: str = "ru",
+    stream: Optional[str] = Query(None, pattern=SCREEN_STREAM_MODES),
+    first: int = Query(SCREEN_STREAM_FIRST_COMPONENTS, ge=0),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    cache_key = f"screen_name:{screen_name}:{platform}:{locale}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    # Try to find screen with exact name and locale
-    screen = db.query(ScreenModel).filter(
-        ScreenModel.name == screen_name,
-        ScreenModel.platform == platform,
-        ScreenModel.locale == locale,
-        ScreenModel.is_active == True
-    ).first()
-    
-    # If not found and locale is 'en', try with _en suffix
-    if not screen and locale == 'en':
-        screen = db.query(ScreenModel).filter(
-            ScreenModel.name == f"{screen_name}_en",
-            ScreenModel.platform == platform,
-            ScreenModel.locale == locale,
-            ScreenModel.is_active == True
-        ).first()
-    
-    # If still not found, try fallback to Russian version
-    if not screen:
-        screen = db.query(ScreenModel).filter(
-            ScreenModel.name == screen_name,
-            ScreenModel.platform == platform,
-            ScreenModel.locale == "ru",
-            ScreenModel.is_active == True
-        ).first()
-    
-    if not screen:
+    """
+    Экран по имени с fallback по локали. Отдельной записи по имени нет: имя разрешается
+    в id (индекс маршрутов или кэш разрешения), а тело берется из screen:{id}, поэтому
+    изменение экрана сбрасывает только его собственные ключи
+    """
+    screen_id = await resolve_screen_id(db, screen_name, platform, locale)
+    if screen_id is None:
         raise HTTPException(status_code=404, detail="Screen not found")
     
-    result = Screen.from_orm(screen).dict()
-    await cache.set(cache_key, result)
-    return result
+    return await screen_response(screen_id, stream, first, if_none_match)
 
 
 @router.post("/", response_model=Screen)
@@ -124,8 +295,9 @@ async def create_screen(
     db.commit()
     db.refresh(db_screen)
     
-    background_tasks.add_task(invalidate_screen_cache, db_screen.id)
-    background_tasks.add_task(notify_screen_update, db_screen.id, Screen.from_orm(db_screen).dict())
+    screen_data = Screen.from_orm(db_screen).dict()
+    background_tasks.add_task(invalidate_screen_cache, db_screen.id, [screen_route(db_screen)], screen_data)
+    background_tasks.add_task(notify_screen_update, db_screen.id, screen_data)
     
     return Screen.from_orm(db_screen)
 
@@ -146,13 +318,19 @@ async def update_screen(
         raise HTTPException(status_code=404, detail="Screen not found")
     
     update_data = screen_update.dict(exclude_unset=True)
+    old_route = screen_route(db_screen)
+    previous_config = db_screen.config
     
-    if update_data.get('config') and update_data['config'] != db_screen.config:
+    config_changed = bool(update_data.get('config')) and update_data['config'] != db_screen.config
+    if config_changed:
         db_screen.version += 1
     
     for field, value in update_data.items():
         setattr(db_screen, field, value)
     
+    if config_changed:
+        record_version(db, screen_id, db_screen.version, db_screen.config, previous_config)
+    
     # Замеряем время сохранения в БД
     db_start = time.time() * 1000
     db.commit()
@@ -172,12 +350,253 @@ async def update_screen(
     
     # Сохраняем метрики в БД (асинхронно)
     background_tasks.add_task(save_performance_metric, db, screen_id, "update", db_time, backend_time)
-    background_tasks.add_task(invalidate_screen_cache, screen_id)
-    background_tasks.add_task(notify_screen_update, screen_id, Screen.from_orm(db_screen).dict(), performance_data)
+    screen_data = Screen.from_orm(db_screen).dict()
+    background_tasks.add_task(invalidate_screen_cache, screen_id, [old_route, screen_route(db_screen)], screen_data)
+    background_tasks.add_task(notify_screen_update, screen_id, screen_data, performance_data)
     
     return Screen.from_orm(db_screen)
 
 
+@router.patch("/{screen_id}", response_model=Screen)
+async def patch_screen(
+    screen_id: int,
+    screen_patch: ScreenPatch,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Частичное обновление config операциями JSON Patch.
+    Патч применяется только к версии base_version, иначе 409
+    """
+    db_screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
+    if not db_screen:
+        raise HTTPException(status_code=404, detail="Screen not found")
+    
+    if not commit_screen_patch(db, db_screen, screen_patch.base_version, screen_patch.operations):
+        return Screen.from_orm(db_screen)
+    
+    screen_data = Screen.from_orm(db_screen).dict()
+    background_tasks.add_task(invalidate_screen_cache, screen_id, [screen_route(db_screen)], screen_data)
+    background_tasks.add_task(
+        notify_screen_patch, screen_id, screen_patch.base_version, db_screen.version, screen_patch.operations
+    )
+    
+    return Screen.from_orm(db_screen)
+
+
+def commit_screen_patch(
+    db: Session,
+    db_screen: ScreenModel,
+    base_version: int,
+    operations: List[Dict[str, Any]]
+) -> bool:
+    """Применяет JSON Patch к версии base_version и коммитит новую версию.
+    
+    Возвращает False, если патч ничего не меняет; при конфликте версий - 409
+    """
+    if db_screen.version != base_version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Version conflict: screen is at version {db_screen.version}"
+        )
+    
+    try:
+        new_config = apply_patch(db_screen.config, operations)
+    except JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Замена корня ("path": "") может дать не объект - такой config не прочитает ни один клиент
+    if not isinstance(new_config, dict):
+        raise HTTPException(status_code=422, detail="Screen config must be a JSON object")
+    
+    if new_config == db_screen.config:
+        return False
+    
+    # Версия сверяется в самом UPDATE, чтобы параллельные патчи не затерли друг друга
+    updated = db.query(ScreenModel).filter(
+        ScreenModel.id == db_screen.id,
+        ScreenModel.version == base_version
+    ).update(
+        {ScreenModel.config: store_config(db, new_config), ScreenModel.version: base_version + 1},
+        synchronize_session=False
+    )
+    if not updated:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Version conflict: screen was modified concurrently")
+    record_version(db, db_screen.id, base_version + 1, new_config, db_screen.config)
+    db.commit()
+    db.refresh(db_screen)
+    return True
+
+
+@router.get("/{screen_id}/subtree")
+async def get_screen_subtree(
+    screen_id: int,
+    component_id: Optional[str] = None,
+    pointer: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Поддерево config по id компонента или JSON Pointer - для обновления одного виджета
+    """
+    if (component_id is None) == (pointer is None):
+        raise HTTPException(status_code=400, detail="Specify exactly one of component_id or pointer")
+    
+    entry = await get_screen_entry(screen_id)
+    # ETag поддерева меняется вместе с экраном; 304 - без разбора config
+    etag = f"{entry.etag}-{content_hash((component_id or pointer).encode())[:8]}"
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": quote_etag(etag)})
+    
+    screen = orjson.loads(entry.body)
+    if component_id is not None:
+        pointer = (await get_component_index(screen)).get(component_id)
+        if pointer is None:
+            raise HTTPException(status_code=404, detail="Component not found")
+    
+    try:
+        subtree = resolve_pointer(screen["config"], pointer)
+    except JsonPatchError:
+        raise HTTPException(status_code=404, detail="Path not found")
+    
+    return JSONResponse(
+        {
+            "screen_id": screen_id,
+            "version": screen["version"],
+            "component_id": component_id,
+            "pointer": pointer,
+            "component": subtree,
+        },
+        headers={"ETag": quote_etag(etag)}
+    )
+
+
+@router.put("/{screen_id}/components/{component_id}", response_model=Screen)
+async def update_screen_component(
+    screen_id: int,
+    component_id: str,
+    update: ScreenComponentUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Заменяет поддерево одного компонента; клиентам уходит component_update с его путем
+    """
+    db_screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
+    if not db_screen:
+        raise HTTPException(status_code=404, detail="Screen not found")
+    
+    if db_screen.version != update.base_version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Version conflict: screen is at version {db_screen.version}"
+        )
+    
+    pointer = (await get_component_index(Screen.from_orm(db_screen).dict())).get(component_id)
+    if pointer is None:
+        raise HTTPException(status_code=404, detail="Component not found")
+    
+    operations = [{"op": "replace", "path": pointer, "value": update.component}]
+    if not commit_screen_patch(db, db_screen, update.base_version, operations):
+        return Screen.from_orm(db_screen)
+    
+    screen_data = Screen.from_orm(db_screen).dict()
+    background_tasks.add_task(invalidate_screen_cache, screen_id, [screen_route(db_screen)], screen_data)
+    background_tasks.add_task(
+        notify_component_update, screen_id, update.base_version, db_screen.version,
+        component_id, pointer, update.component
+    )
+    
+    return Screen.from_orm(db_screen)
+
+
+@router.get("/{screen_id}/versions")
+async def get_screen_versions(screen_id: int, db: Session = Depends(get_db)):
+    if not db.query(ScreenModel.id).filter(ScreenModel.id == screen_id).first():
+        raise HTTPException(status_code=404, detail="Screen not found")
+    return list_versions(db, screen_id)
+
+
+@router.get("/{screen_id}/versions/{version}")
+async def get_screen_version(screen_id: int, version: int, db: Session = Depends(get_db)):
+    if version == get_current_version(db, screen_id):
+        return {"screen_id": screen_id, "version": version, "config": load_version_config(db, screen_id, version)}
+    
+    # Прошлые версии неизменны - восстановленный config можно кэшировать надолго
+    def load_version():
+        return {"screen_id": screen_id, "version": version, "config": load_version_config(db, screen_id, version)}
+    
+    return await cached_json_response(f"screen_version:{screen_id}:{version}", load_version, ttl=SCREEN_CACHE_TTL)
+
+
+@router.get("/{screen_id}/diff")
+async def diff_screen_versions(
+    screen_id: int,
+    from_version: int,
+    to_version: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """JSON Patch, переводящий config версии from_version в to_version (по умолчанию - текущую)"""
+    current_version = get_current_version(db, screen_id)
+    if to_version is None:
+        to_version = current_version
+    return {
+        "screen_id": screen_id,
+        "from_version": from_version,
+        "to_version": to_version,
+        "patch": make_patch(
+            load_version_config(db, screen_id, from_version),
+            load_version_config(db, screen_id, to_version)
+        ),
+    }
+
+
+@router.post("/{screen_id}/versions/{version}/rollback", response_model=Screen)
+async def rollback_screen(
+    screen_id: int,
+    version: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Откат config к прошлой версии; откат записывается в историю новой версией"""
+    db_screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
+    if not db_screen:
+        raise HTTPException(status_code=404, detail="Screen not found")
+    
+    config = load_version_config(db, screen_id, version)
+    if config == db_screen.config:
+        return Screen.from_orm(db_screen)
+    
+    previous_config = db_screen.config
+    db_screen.config = config
+    db_screen.version += 1
+    record_version(db, screen_id, db_screen.version, config, previous_config)
+    db.commit()
+    db.refresh(db_screen)
+    
+    screen_data = Screen.from_orm(db_screen).dict()
+    background_tasks.add_task(invalidate_screen_cache, screen_id, [screen_route(db_screen)], screen_data)
+    background_tasks.add_task(notify_screen_update, screen_id, screen_data)
+    
+    return Screen.from_orm(db_screen)
+
+
+def get_current_version(db: Session, screen_id: int) -> int:
+    current_version = db.query(ScreenModel.version).filter(ScreenModel.id == screen_id).scalar()
+    if current_version is None:
+        raise HTTPException(status_code=404, detail="Screen not found")
+    return current_version
+
+
+def load_version_config(db: Session, screen_id: int, version: int) -> Dict[str, Any]:
+    current_version = get_current_version(db, screen_id)
+    if version == current_version:
+        return load_config(db, db.query(ScreenModel.config).filter(ScreenModel.id == screen_id).scalar())
+    config = get_version_config(db, screen_id, version) if 0 < version < current_version else None
+    if config is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return config
+
+
 @router.delete("/{screen_id}")
 async def delete_screen(
     screen_id: int,
@@ -188,10 +607,11 @@ async def delete_screen(
     if not db_screen:
         raise HTTPException(status_code=404, detail="Screen not found")
     
+    route = screen_route(db_screen)
     db.delete(db_screen)
     db.commit()
     
-    background_tasks.add_task(invalidate_screen_cache, screen_id)
+    background_tasks.add_task(invalidate_screen_cache, screen_id, [route])
     
     return {"message": "Screen deleted successfully"}
 
@@ -200,6 +620,7 @@ async def delete_screen(
 async def duplicate_screen(
     screen_id: int,
     new_name: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     original_screen = db.query(ScreenModel).filter(ScreenModel.id == screen_id).first()
@@ -229,6 +650,10 @@ async def duplicate_screen(
     db.commit()
     db.refresh(new_screen)
     
+    background_tasks.add_task(
+        invalidate_screen_cache, new_screen.id, [screen_route(new_screen)], Screen.from_orm(new_screen).dict()
+    )
+    
     return Screen.from_orm(new_screen)
 
 
@@ -268,7 +693,7 @@ async def create_screen_from_template(
         raise HTTPException(status_code=400, detail="Screen with this name already exists")
     
     # Подставляем переменные в конфигурацию шаблона
-    processed_config = substitute_template_variables(template.config, template_variables)
+    processed_config = render_template(template, template_variables)
     
     # Создаем экран
     screen_title = screen_title or screen_name
@@ -287,46 +712,181 @@ async def create_screen_from_template(
     db.refresh(new_screen)
     
     if background_tasks:
-        background_tasks.add_task(invalidate_screen_cache, new_screen.id)
-        background_tasks.add_task(notify_screen_update, new_screen.id, Screen.from_orm(new_screen).dict())
+        screen_data = Screen.from_orm(new_screen).dict()
+        background_tasks.add_task(invalidate_screen_cache, new_screen.id, [screen_route(new_screen)], screen_data)
+        background_tasks.add_task(notify_screen_update, new_screen.id, screen_data)
     
     return Screen.from_orm(new_screen)
 
 
+@router.post("/create-from-template/bulk")
+async def create_screens_from_template(
+    request_data: BulkScreensFromTemplate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Создает пакет экранов из одного шаблона: одна проверка имен, одна транзакция,
+    один проход инвалидации кэша и уведомлений
+    """
+    template = db.query(TemplateModel).filter(TemplateModel.id == request_data.template_id).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    names = [item.screen_name for item in request_data.screens]
+    duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=400, detail={"message": "Duplicate screen names in request", "names": duplicates})
+    
+    # Имя экрана уникально в БД, поэтому конфликты проверяем одним запросом по именам
+    existing = db.query(ScreenModel.name).filter(ScreenModel.name.in_(names)).all()
+    if existing:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Screens with these names already exist", "names": sorted(row.name for row in existing)}
+        )
+    
+    # Подстановка - чистый CPU по общему плану шаблона, потоки ее не ускорят под GIL,
+    # поэтому весь пакет рендерится одним вызовом вне event loop
+    plan = get_template_plan((template.id, template.updated_at), template.config)
+    configs = await asyncio.to_thread(
+        lambda: [plan.render(item.template_variables) for item in request_data.screens]
+    )
+    
+    description = f"Created from template: {template.name}"
+    new_screens = [
+        ScreenModel(
+            name=item.screen_name,
+            title=item.screen_title or item.screen_name,
+            description=description,
+            config=config,
+            platform=item.platform or request_data.platform,
+            locale=item.locale or request_data.locale,
+            version=1,
+            is_active=False
+        )
+        for item, config in zip(request_data.screens, configs)
+    ]
+    
+    db.add_all(new_screens)
+    db.flush()
+    # Данные для ответа собираем до commit: после него атрибуты истекают и
+    # обращение к каждому объекту стало бы отдельным запросом
+    created = [
+        {
+            "id": screen.id,
+            "name": screen.name,
+            "title": screen.title,
+            "platform": screen.platform,
+            "locale": screen.locale,
+            "version": screen.version,
+            "is_active": screen.is_active,
+        }
+        for screen in new_screens
+    ]
+    db.commit()
+    
+    background_tasks.add_task(
+        invalidate_screen_routes,
+        [(screen["id"], screen) for screen in created],
+        [(screen["name"], screen["platform"], screen["locale"]) for screen in created]
+    )
+    background_tasks.add_task(notify_screens_created, created)
+    
+    return {"created": created, "count": len(created)}
+
+
 def substitute_template_variables(config: Dict[str, Any], variables: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Рекурсивно подставляет переменные шаблона в конфигурацию
+    Подставляет переменные шаблона в конфигурацию (без кэширования плана)
     """
-    if isinstance(config, dict):
-        result = {}
-        for key, value in config.items():
-            result[key] = substitute_template_variables(value, variables)
-        return result
-    elif isinstance(config, list):
-        return [substitute_template_variables(item, variables) for item in config]
-    elif isinstance(config, str):
-        # Заменяем переменные в строке
-        def replace_variable(match):
-            var_name = match.group(1)
-            return str(variables.get(var_name, match.group(0)))
-        
-        return re.sub(r'\{\{(\w+)\}\}', replace_variable, config)
-    else:
-        return config
+    return compile_template(config).render(variables)
+
+
+def render_template(template: TemplateModel, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Подставляет переменные через план шаблона, скомпилированный один раз на его версию
+    """
+    return get_template_plan((template.id, template.updated_at), template.config).render(variables)
+
+
+def screen_route(screen: ScreenModel) -> Tuple[str, str, str]:
+    return (screen.name, screen.platform, screen.locale)
 
 
-async def invalidate_screen_cache(screen_id: int):
+async def invalidate_screen_cache(
+    screen_id: int,
+    routes: Iterable[Tuple[str, str, str]] = (),
+    screen_data: Optional[dict] = None
+):
+    """routes - (name, platform, locale) экрана до и после изменения,
+    screen_data - новое состояние экрана (None - экран удален)"""
     await cache.delete(f"screen:{screen_id}")
-    await cache.invalidate_pattern("screens:*")
-    await cache.invalidate_pattern("screen_name:*")
+    await invalidate_screen_routes([(screen_id, screen_data)], routes)
+
+async def invalidate_screens_cache(
+    changes: List[Tuple[int, Optional[dict]]],
+    routes: Iterable[Tuple[str, str, str]]
+):
+    """Инвалидация после массового изменения экранов (импорт, синхронизация файлов)"""
+    if not changes:
+        return
+    await cache.delete_many(f"screen:{screen_id}" for screen_id, _ in changes)
+    await invalidate_screen_routes(changes, routes)
+
+async def invalidate_imported_screens(result: ScreenImport):
+    await invalidate_screens_cache(result.changes, result.routes)
+
+async def invalidate_screen_routes(
+    changes: List[Tuple[int, Optional[dict]]],
+    routes: Iterable[Tuple[str, str, str]]
+):
+    """Общая часть инвалидации для одного экрана и пакета: маршруты, разрешение имен, списки"""
+    await publish_screen_routes(changes)
+    await invalidate_resolution(routes)
+    await materialize_screens(screen_id for screen_id, _ in changes)
+    await cache.invalidate_namespace("screens")
     # Также инвалидируем кэш аналитики, так как количество активных экранов может измениться
-    await cache.invalidate_pattern("analytics_overview:*")
+    await cache.invalidate_namespace("analytics_overview", soft=True)
 
 async def notify_screen_update(screen_id: int, screen_data: dict, performance_data: dict = None):
     """Уведомить всех клиентов об обновлении экрана с метриками производительности"""
     print(f"🚀 notify_screen_update called for screen {screen_id}")
     await manager.broadcast_screen_update(str(screen_id), screen_data, performance_data)
 
+async def notify_screens_created(screens: List[Dict[str, Any]]):
+    """Уведомления о пакете созданных экранов одним проходом"""
+    for screen in screens:
+        await manager.broadcast_screen_update(str(screen["id"]), screen, None)
+
+async def notify_screen_patch(screen_id: int, base_version: int, version: int, operations: List[Dict[str, Any]]):
+    """Разослать клиентам экрана сам патч вместо полного config"""
+    await manager.send_to_screen(str(screen_id), {
+        "type": "screen_patch",
+        "screen_id": str(screen_id),
+        "base_version": base_version,
+        "version": version,
+        "patch": operations,
+        "timestamp": datetime.now().isoformat()
+    })
+
+async def notify_component_update(
+    screen_id: int,
+    base_version: int,
+    version: int,
+    component_id: str,
+    pointer: str,
+    component: Dict[str, Any]
+):
+    """Разослать клиентам экрана только измененное поддерево и его путь в config"""
+    await manager.broadcast_component_update(str(screen_id), {
+        "id": component_id,
+        "pointer": pointer,
+        "base_version": base_version,
+        "version": version,
+        "data": component,
+    })
+
 def save_performance_metric(db: Session, screen_id: int, operation_type: str, db_time: float, backend_time: float):
     """Сохранить метрику производительности в БД"""
     try:
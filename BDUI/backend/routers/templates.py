@@ -5,6 +5,7 @@ from database import get_db
 from models import Template as TemplateModel
 from schemas import Template, TemplateCreate, TemplateUpdate
 from cache import cache
+from response_cache import cached_json_response
 
 router = APIRouter()
 
@@ -16,38 +17,31 @@ async def get_templates(
     db: Session = Depends(get_db)
 ):
     cache_key = f"templates:{category}:{is_public}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return [Template(**tmpl) for tmpl in cached_result]
     
-    query = db.query(TemplateModel)
+    def load_templates():
+        query = db.query(TemplateModel)
+        
+        if category:
+            query = query.filter(TemplateModel.category == category)
+        if is_public is not None:
+            query = query.filter(TemplateModel.is_public == is_public)
+        
+        return [Template.from_orm(template).dict() for template in query.all()]
     
-    if category:
-        query = query.filter(TemplateModel.category == category)
-    if is_public is not None:
-        query = query.filter(TemplateModel.is_public == is_public)
-    
-    templates = query.all()
-    result = [Template.from_orm(template) for template in templates]
-    
-    await cache.set(cache_key, [tmpl.dict() for tmpl in result])
-    return result
+    return await cached_json_response(cache_key, load_templates)
 
 
 @router.get("/{template_id}", response_model=Template)
 async def get_template(template_id: int, db: Session = Depends(get_db)):
     cache_key = f"template:{template_id}"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return Template(**cached_result)
     
-    template = db.query(TemplateModel).filter(TemplateModel.id == template_id).first()
-    if not template:
-        raise HTTPException(status_code=404, detail="Template not found")
+    def load_template():
+        template = db.query(TemplateModel).filter(TemplateModel.id == template_id).first()
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        return Template.from_orm(template).dict()
     
-    result = Template.from_orm(template)
-    await cache.set(cache_key, result.dict())
-    return result
+    return await cached_json_response(cache_key, load_template)
 
 
 @router.post("/", response_model=Template)
@@ -156,22 +150,19 @@ async def inherit_template(
 
 @router.get("/categories/list")
 async def get_template_categories(db: Session = Depends(get_db)):
-    cache_key = "template_categories"
-    cached_result = await cache.get(cache_key)
-    if cached_result:
-        return cached_result
+    # В пространстве templates: сбрасывается вместе со списками шаблонов
+    cache_key = "templates:categories"
     
-    categories = db.query(TemplateModel.category).distinct().all()
-    result = [cat[0] for cat in categories if cat[0]]
+    def load_categories():
+        categories = db.query(TemplateModel.category).distinct().all()
+        return [cat[0] for cat in categories if cat[0]]
     
-    await cache.set(cache_key, result)
-    return result
+    return await cached_json_response(cache_key, load_categories)
 
 
 async def invalidate_template_cache():
-    await cache.invalidate_pattern("template:*")
-    await cache.invalidate_pattern("templates:*")
-    await cache.delete("template_categories")
+    await cache.invalidate_namespace("template")
+    await cache.invalidate_namespace("templates")
 
 
 
@@ -56,6 +56,18 @@ class ScreenUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class ScreenPatch(BaseModel):
+    """RFC 6902 операции над config относительно версии base_version"""
+    base_version: int
+    operations: List[Dict[str, Any]]
+
+
+class ScreenComponentUpdate(BaseModel):
+    """Новое поддерево компонента относительно версии base_version"""
+    base_version: int
+    component: Dict[str, Any]
+
+
 class Screen(ScreenBase):
     id: int
     version: int
@@ -67,6 +79,27 @@ class Screen(ScreenBase):
         from_attributes = True
 
 
+class ScreenFields(BaseModel):
+    """Экран, выбранный с fields=: в ответе только запрошенные поля и id"""
+    id: int
+    name: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    config: Optional[Dict[str, Any]] = None
+    platform: Optional[str] = None
+    locale: Optional[str] = None
+    version: Optional[int] = None
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class ScreenPage(BaseModel):
+    """Страница списка экранов; next_cursor - None на последней странице"""
+    items: List[ScreenFields]
+    next_cursor: Optional[str] = None
+
+
 class AnalyticsEvent(BaseModel):
     screen_id: int
     component_id: Optional[str] = None
@@ -149,6 +182,22 @@ class TemplateUpdate(BaseModel):
     is_public: Optional[bool] = None
 
 
+class ScreenFromTemplate(BaseModel):
+    screen_name: str
+    screen_title: Optional[str] = None
+    template_variables: Dict[str, Any] = {}
+    platform: Optional[str] = None
+    locale: Optional[str] = None
+
+
+class BulkScreensFromTemplate(BaseModel):
+    """Пакетное создание экранов из одного шаблона; platform/locale - значения по умолчанию"""
+    template_id: int
+    platform: str = "web"
+    locale: str = "ru"
+    screens: List[ScreenFromTemplate] = Field(..., min_length=1, max_length=1000)
+
+
 class Template(TemplateBase):
     id: int
     parent_id: Optional[int] = None
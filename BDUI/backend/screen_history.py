@@ -0,0 +1,86 @@
+"""
+История версий config экранов: периодические полные снимки и дельты между ними
+"""
+import copy
+import os
+from typing import Any, Dict, List, Optional
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from models import ScreenVersion
+from json_patch import apply_patch_in_place, make_patch
+from config_store import load_config
+
+# Полный снимок пишется раз в столько версий, поэтому восстановление любой
+# версии применяет не больше SCREEN_SNAPSHOT_INTERVAL - 1 дельт
+SCREEN_SNAPSHOT_INTERVAL = int(os.getenv("SCREEN_SNAPSHOT_INTERVAL", "10"))
+
+
+def record_version(
+    db: Session,
+    screen_id: int,
+    version: int,
+    config: Dict[str, Any],
+    previous_config: Optional[Dict[str, Any]] = None
+):
+    """Добавляет версию в историю в текущей транзакции.
+
+    previous_config - config версии ``version - 1``: по нему строится дельта, а
+    если экран менялся до ведения истории, он сохраняется снимком.
+    """
+    last_version, last_snapshot = db.query(
+        func.max(ScreenVersion.version),
+        func.max(case((ScreenVersion.is_snapshot == True, ScreenVersion.version))),
+    ).filter(ScreenVersion.screen_id == screen_id).one()
+
+    if last_version is not None and last_version >= version:
+        return
+
+    if last_version != version - 1 and previous_config is not None and version > 1:
+        db.add(ScreenVersion(
+            screen_id=screen_id, version=version - 1, is_snapshot=True, data=previous_config
+        ))
+        last_version = last_snapshot = version - 1
+
+    if last_version != version - 1 or version - last_snapshot >= SCREEN_SNAPSHOT_INTERVAL:
+        db.add(ScreenVersion(screen_id=screen_id, version=version, is_snapshot=True, data=config))
+    else:
+        db.add(ScreenVersion(
+            screen_id=screen_id, version=version, is_snapshot=False,
+            data=make_patch(previous_config, config)
+        ))
+
+
+def list_versions(db: Session, screen_id: int) -> List[Dict[str, Any]]:
+    rows = db.query(
+        ScreenVersion.version, ScreenVersion.is_snapshot, ScreenVersion.created_at
+    ).filter(
+        ScreenVersion.screen_id == screen_id
+    ).order_by(ScreenVersion.version).all()
+    return [
+        {"version": row.version, "is_snapshot": row.is_snapshot, "created_at": row.created_at}
+        for row in rows
+    ]
+
+
+def get_version_config(db: Session, screen_id: int, version: int) -> Optional[Dict[str, Any]]:
+    """Восстанавливает config версии: ближайший снимок + дельты после него"""
+    base_version = db.query(func.max(ScreenVersion.version)).filter(
+        ScreenVersion.screen_id == screen_id,
+        ScreenVersion.is_snapshot == True,
+        ScreenVersion.version <= version
+    ).scalar()
+    if base_version is None:
+        return None
+
+    rows = db.query(ScreenVersion.version, ScreenVersion.is_snapshot, ScreenVersion.data).filter(
+        ScreenVersion.screen_id == screen_id,
+        ScreenVersion.version >= base_version,
+        ScreenVersion.version <= version
+    ).order_by(ScreenVersion.version).all()
+    if len(rows) != version - base_version + 1:
+        return None
+
+    config = copy.deepcopy(load_config(db, rows[0].data))
+    for row in rows[1:]:
+        config = apply_patch_in_place(config, row.data)
+    return config
@@ -0,0 +1,129 @@
+"""
+Материализация клиентских ответов экранов: готовый payload на (экран, вариант A/B)
+
+(name, platform, locale) сводится к id экрана индексом маршрутов, поэтому payload
+хранится на пару (экран, вариант) и не дублируется для локалей с fallback.
+Записи пересчитываются при изменении экрана или его A/B теста; заодно строится
+индекс компонентов текущей версии (component_index).
+"""
+import asyncio
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from models import Screen as ScreenModel, ABTest as ABTestModel
+from database import session_scope
+from cache import cache
+from response_cache import pack_json
+from component_index import component_index_key, build_component_index
+
+RESOLVED_SCREEN_TTL = 24 * 3600
+# Сколько экранов материализуется за один проход (два запроса к БД)
+MATERIALIZE_BATCH_SIZE = 200
+
+CONTROL = "control"
+
+
+def assignment_key(screen_id: int) -> str:
+    return f"ab_assignment:{screen_id}"
+
+
+def resolved_key(screen_id: int, variant: Optional[str]) -> str:
+    """variant=None - config самого экрана (control); ключ варианта "control" с ним не совпадает"""
+    if variant is None:
+        return f"resolved_screen:{screen_id}:{CONTROL}"
+    return f"resolved_screen:{screen_id}:variant:{variant}"
+
+
+def build_assignment(test: Optional[ABTestModel]) -> Dict[str, Any]:
+    """Все, что нужно для выбора варианта без обращения к БД"""
+    if test is None:
+        return {"test_id": None, "traffic_allocation": 0.0, "variants": []}
+    return {
+        "test_id": test.id,
+        "traffic_allocation": test.traffic_allocation,
+        "variants": list((test.variants or {}).keys()),
+    }
+
+
+def choose_variant(assignment: Dict[str, Any], identifier: str) -> Optional[str]:
+    """Вариант пользователя (None - control), детерминированно по test_id и identifier"""
+    if assignment["test_id"] is None or not assignment["variants"]:
+        return None
+    hash_value = int(hashlib.md5(f"{assignment['test_id']}:{identifier}".encode()).hexdigest(), 16)
+    if (hash_value % 100) / 100 < assignment["traffic_allocation"]:
+        variants = assignment["variants"]
+        return variants[hash_value % len(variants)]
+    return None
+
+
+def build_payload(screen: ScreenModel, test: Optional[ABTestModel], variant: Optional[str]) -> Dict[str, Any]:
+    test_id = test.id if test is not None else None
+    if variant is None or test is None or variant not in (test.variants or {}):
+        return {"variant": CONTROL, "config": screen.config, "test_id": test_id}
+    return {"variant": variant, "config": test.variants[variant], "test_id": test_id}
+
+
+def active_test(db: Session, screen_id: int) -> Optional[ABTestModel]:
+    return db.query(ABTestModel).filter(
+        ABTestModel.screen_id == screen_id,
+        ABTestModel.is_active == True
+    ).first()
+
+
+def collect_entries(db: Session, screen_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Записи кэша по экранам двумя запросами; отсутствующих экранов в результате нет"""
+    screens = db.query(ScreenModel).filter(ScreenModel.id.in_(screen_ids)).all()
+    tests = {}
+    for test in db.query(ABTestModel).filter(
+        ABTestModel.screen_id.in_(screen_ids),
+        ABTestModel.is_active == True
+    ).order_by(ABTestModel.id):
+        tests.setdefault(test.screen_id, test)
+
+    entries = {}
+    for screen in screens:
+        test = tests.get(screen.id)
+        assignment = build_assignment(test)
+        items = {
+            assignment_key(screen.id): assignment,
+            component_index_key(screen.id): {
+                "version": screen.version, "paths": build_component_index(screen.config)
+            },
+        }
+        for variant in [None] + assignment["variants"]:
+            items[resolved_key(screen.id, variant)] = pack_json(build_payload(screen, test, variant))
+        entries[screen.id] = items
+    return entries
+
+
+def _load_entries(screen_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    with session_scope() as db:
+        return collect_entries(db, screen_ids)
+
+
+async def materialize_screens(screen_ids: Iterable[int]):
+    """Пересчитывает payload экранов после изменения экрана или A/B теста.
+
+    Старые записи сначала удаляются: удаление рассылается воркерам и сбрасывает
+    их L1, а ключи исчезнувших вариантов и удаленных экранов не остаются в Redis.
+    """
+    screen_ids = list(dict.fromkeys(screen_ids))
+    for start in range(0, len(screen_ids), MATERIALIZE_BATCH_SIZE):
+        batch = screen_ids[start:start + MATERIALIZE_BATCH_SIZE]
+        old_assignments = await cache.get_many([assignment_key(screen_id) for screen_id in batch])
+        entries = await asyncio.to_thread(_load_entries, batch)
+
+        stale = set()
+        items = {}
+        for screen_id in batch:
+            old_assignment = old_assignments.get(assignment_key(screen_id))
+            stale.update((
+                assignment_key(screen_id), component_index_key(screen_id), resolved_key(screen_id, None)
+            ))
+            if old_assignment:
+                stale.update(resolved_key(screen_id, variant) for variant in old_assignment["variants"])
+            items.update(entries.get(screen_id, {}))
+
+        await cache.delete_many(stale | items.keys())
+        if items:
+            await cache.set_many(items, ttl=RESOLVED_SCREEN_TTL)
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session
+from models import Screen as ScreenModel
+from database import session_scope
+from cache import cache
+
+# Найденные экраны кэшируются дольше, промахи - коротко
+RESOLVE_CACHE_TTL = 300
+RESOLVE_NEGATIVE_TTL = 30
+# Полная перезагрузка индекса маршрутов на случай потерянных сообщений pub/sub
+ROUTING_INDEX_REFRESH_INTERVAL = int(os.getenv("ROUTING_INDEX_REFRESH_INTERVAL", "60"))
+
+
+def resolution_cache_key(screen_name: str, platform: str) -> str:
+    return f"screen_resolve:{screen_name}:{platform}"
+
+
+def candidate_routes(screen_name: str, platform: str, locale: str) -> List[Tuple[str, str, str]]:
+    """Порядок поиска: точная локаль, ``<name>_en`` для en, затем русская версия"""
+    routes = [(screen_name, platform, locale)]
+    if locale == 'en':
+        routes.append((f"{screen_name}_en", platform, locale))
+    if locale != "ru":
+        routes.append((screen_name, platform, "ru"))
+    return routes
+
+
+def find_screen_id(db: Session, screen_name: str, platform: str, locale: str) -> Optional[int]:
+    """Ищет активный экран с учетом fallback по локали одним запросом.
+
+    Выбираются все кандидаты (только ключевые колонки, без config), а лучший
+    определяется в памяти по порядку ``candidate_routes``.
+    """
+    routes = candidate_routes(screen_name, platform, locale)
+    rows = db.query(
+        ScreenModel.id, ScreenModel.name, ScreenModel.platform, ScreenModel.locale
+    ).filter(
+        ScreenModel.name.in_({name for name, _, _ in routes}),
+        ScreenModel.platform == platform,
+        ScreenModel.locale.in_({route_locale for _, _, route_locale in routes}),
+        ScreenModel.is_active == True
+    ).all()
+    found = {(row.name, row.platform, row.locale): row.id for row in rows}
+    for route in routes:
+        if route in found:
+            return found[route]
+    return None
+
+
+class ScreenRoute(NamedTuple):
+    id: int
+    version: int
+    is_active: bool
+
+
+class RoutingIndex:
+    """Индекс воркера (name, platform, locale) -> (id, version, is_active).
+
+    Загружается одним запросом без config, обновляется сообщениями ``screen_routes``
+    из канала инвалидаций и периодической перезагрузкой. Пока индекс не загружен,
+    разрешение идет через Redis/БД.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str, str], ScreenRoute] = {}
+        self._keys: Dict[int, Tuple[str, str, str]] = {}
+        self._pending: Optional[List[dict]] = None
+        self._reload = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def resolve(self, screen_name: str, platform: str, locale: str) -> Optional[ScreenRoute]:
+        for route in candidate_routes(screen_name, platform, locale):
+            entry = self._routes.get(route)
+            if entry is not None and entry.is_active:
+                return entry
+        return None
+
+    def load(self, db: Session):
+        rows = db.query(
+            ScreenModel.id, ScreenModel.name, ScreenModel.platform, ScreenModel.locale,
+            ScreenModel.version, ScreenModel.is_active
+        ).all()
+        routes = {}
+        keys = {}
+        for row in rows:
+            key = (row.name, row.platform, row.locale)
+            routes[key] = ScreenRoute(row.id, row.version, bool(row.is_active))
+            keys[row.id] = key
+        self._routes, self._keys = routes, keys
+        self.ready = True
+
+    def apply(self, message: dict):
+        """Применяет состояние одного экрана из ``screen_routes`` (route=None - экран удален)"""
+        screen_id = message["id"]
+        old_key = self._keys.pop(screen_id, None)
+        if old_key is not None and self._routes.get(old_key, (None,))[0] == screen_id:
+            del self._routes[old_key]
+        if message.get("route") is not None:
+            key = tuple(message["route"])
+            self._routes[key] = ScreenRoute(screen_id, message["version"], message["is_active"])
+            self._keys[screen_id] = key
+
+    def handle_message(self, message: Optional[dict]):
+        if message is None:
+            # Сообщения могли потеряться - перезагружаемся, не дожидаясь интервала
+            self._reload.set()
+        elif message.get("op") == "screen_routes":
+            for route in message["routes"]:
+                if self._pending is not None:
+                    self._pending.append(route)
+                self.apply(route)
+
+    async def _reload_from_db(self):
+        # Сообщения, пришедшие во время загрузки, применяются поверх снимка
+        self._pending = []
+        try:
+            def load():
+                with session_scope() as db:
+                    self.load(db)
+            await asyncio.to_thread(load)
+            for message in self._pending:
+                self.apply(message)
+        finally:
+            self._pending = None
+
+    async def _refresh_loop(self):
+        while True:
+            self._reload.clear()
+            try:
+                await self._reload_from_db()
+            except Exception as e:
+                print(f"⚠️ Routing index reload error: {e}")
+            try:
+                await asyncio.wait_for(self._reload.wait(), ROUTING_INDEX_REFRESH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Загружает индекс и подписывает его на обновления (вызывается из lifespan)"""
+        if self._task is None:
+            cache.add_invalidation_handler(self.handle_message)
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+routing_index = RoutingIndex()
+
+
+async def publish_screen_routes(changes: Iterable[Tuple[int, Optional[Dict[str, Any]]]]):
+    """Сообщает всем воркерам новое состояние экранов одним сообщением.
+
+    changes - пары (id, данные экрана), None вместо данных - экран удален.
+    """
+    routes = []
+    for screen_id, screen in changes:
+        route = {"id": screen_id, "route": None}
+        if screen is not None:
+            route.update(
+                route=[screen["name"], screen["platform"], screen["locale"]],
+                version=screen["version"],
+                is_active=screen["is_active"],
+            )
+        routes.append(route)
+    if routes:
+        await cache.broadcast({"op": "screen_routes", "routes": routes})
+
+
+def route_entry(screen_id: Optional[int], now: float) -> Dict[str, Any]:
+    ttl = RESOLVE_CACHE_TTL if screen_id else RESOLVE_NEGATIVE_TTL
+    return {"screen_id": screen_id, "expires_at": now + ttl}
+
+
+async def resolve_screen_id(db: Session, screen_name: str, platform: str, locale: str) -> Optional[int]:
+    """Возвращает id экрана для (name, platform, locale) или None, если экрана нет.
+
+    Результаты, включая промахи и найденные через fallback, кэшируются в одной
+    записи на (name, platform), поэтому изменение экрана инвалидирует их точечно.
+    Загруженный индекс маршрутов отвечает без обращений к Redis и БД.
+    """
+    if routing_index.ready:
+        route = routing_index.resolve(screen_name, platform, locale)
+        return route.id if route is not None else None
+
+    key = resolution_cache_key(screen_name, platform)
+    now = time.time()
+    routes = await cache.get(key) or {}
+    route = routes.get(locale)
+    if route is not None and route["expires_at"] > now:
+        return route["screen_id"]
+
+    # Запрос к БД - в пуле потоков, не блокируя цикл событий
+    screen_id = await asyncio.to_thread(find_screen_id, db, screen_name, platform, locale)
+
+    # Запись из кэша не изменяем: она может быть общей с L1
+    routes = {loc: entry for loc, entry in routes.items() if entry["expires_at"] > now}
+    routes[locale] = route_entry(screen_id, now)
+    await cache.set(key, routes, ttl=RESOLVE_CACHE_TTL)
+    return screen_id
+
+
+def affected_resolution_keys(screen_name: str, platform: str, locale: str) -> set:
+    """Ключи разрешения, на которые влияет экран (name, platform, locale).
+
+    Fallback на ru затрагивает все локали имени, поэтому ключ - на (name, platform);
+    экран ``<name>_en`` с локалью en дополнительно отвечает за ``<name>`` в en.
+    """
+    keys = {resolution_cache_key(screen_name, platform)}
+    if locale == "en" and screen_name.endswith("_en"):
+        keys.add(resolution_cache_key(screen_name[:-len("_en")], platform))
+    return keys
+
+
+async def invalidate_resolution(routes: Iterable[Tuple[str, str, str]]):
+    keys = set()
+    for screen_name, platform, locale in routes:
+        keys |= affected_resolution_keys(screen_name, platform, locale)
+    for key in keys:
+        await cache.delete(key)
@@ -0,0 +1,104 @@
+"""
+Прогрессивная отдача больших экранов: сначала заголовок и первые компоненты,
+остальное - потоком NDJSON или страницами по курсору продолжения
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import orjson
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from response_cache import CachedJSON, encode_json, etag_matches, quote_etag
+
+# Сколько компонентов верхнего уровня уходит вместе с заголовком экрана
+SCREEN_STREAM_FIRST_COMPONENTS = 8
+# Размер порции компонентов в потоке и на странице продолжения
+SCREEN_STREAM_CHUNK_COMPONENTS = 20
+
+SCREEN_STREAM_MODES = "^(ndjson|cursor)$"
+
+
+def split_screen(screen: Dict[str, Any], first: int) -> Tuple[Dict[str, Any], List[Any], int]:
+    """Экран с первыми first компонентами, остальные компоненты и их общее число.
+
+    Сохраненный config не меняется: режется только ответ.
+    """
+    config = screen.get("config")
+    components = config.get("components") if isinstance(config, dict) else None
+    if not isinstance(components, list):
+        return screen, [], 0
+    head = {**screen, "config": {**config, "components": components[:first]}}
+    return head, components[first:], len(components)
+
+
+def format_continuation(version: int, offset: int) -> str:
+    return f"{version}:{offset}"
+
+
+def parse_continuation(cursor: str) -> Tuple[int, int]:
+    version, _, offset = cursor.partition(":")
+    if not version.isdigit() or not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return int(version), int(offset)
+
+
+def iter_screen_ndjson(screen: Dict[str, Any], first: int, chunk_size: int) -> Iterator[bytes]:
+    """header -> components (по chunk_size) -> end; каждая строка уходит клиенту сразу"""
+    head, rest, total = split_screen(screen, first)
+    yield encode_json({"type": "header", "screen": head, "components_total": total}) + b"\n"
+    for start in range(0, len(rest), chunk_size):
+        yield encode_json({
+            "type": "components",
+            "offset": first + start,
+            "components": rest[start:start + chunk_size],
+        }) + b"\n"
+    yield encode_json({"type": "end", "version": screen["version"]}) + b"\n"
+
+
+def cursor_screen_payload(screen: Dict[str, Any], first: int) -> Dict[str, Any]:
+    """Экран с первыми компонентами и курсором для GET /{id}/components"""
+    head, rest, total = split_screen(screen, first)
+    continuation = None
+    if rest:
+        continuation = {
+            "cursor": format_continuation(screen["version"], first),
+            "remaining": len(rest),
+            "components_total": total,
+        }
+    return {**head, "continuation": continuation}
+
+
+def components_page(screen: Dict[str, Any], cursor: str, limit: int) -> Dict[str, Any]:
+    version, offset = parse_continuation(cursor)
+    if version != screen["version"]:
+        # Экран изменился после заголовка - склеивать части разных версий нельзя
+        raise HTTPException(status_code=409, detail="Screen version changed, reload the screen")
+    _, rest, total = split_screen(screen, offset)
+    next_offset = offset + limit
+    return {
+        "offset": offset,
+        "components": rest[:limit],
+        "next_cursor": format_continuation(version, next_offset) if next_offset < total else None,
+    }
+
+
+def stream_screen_response(
+    entry: CachedJSON,
+    mode: str,
+    first: int,
+    chunk_size: int = SCREEN_STREAM_CHUNK_COMPONENTS,
+    if_none_match: Optional[str] = None
+) -> Response:
+    """Ответ экрана в потоковом режиме из готовой записи кэша"""
+    # Представление отличается от полного JSON, поэтому и ETag у него свой
+    etag = f"{entry.etag}-{mode}{first}"
+    headers = {"ETag": quote_etag(etag)}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    screen = orjson.loads(entry.body)
+    if mode == "ndjson":
+        return StreamingResponse(
+            iter_screen_ndjson(screen, first, chunk_size), media_type="application/x-ndjson", headers=headers
+        )
+    return Response(
+        content=encode_json(cursor_screen_payload(screen, first)), media_type="application/json", headers=headers
+    )
@@ -0,0 +1,361 @@
+"""
+Потоковый экспорт и импорт экранов: NDJSON или tar-архив JSON файлов
+Использование:
+    python screen_transfer.py export [-o screens.ndjson] [--format ndjson|tar]
+    python screen_transfer.py import PATH [PATH ...] [--workers N]
+PATH - файл .ndjson, tar-архив (.tar, .tar.gz) или JSON файл/директория с ними
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import case, cast, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+from models import ABTest as ABTestModel, Analytics as AnalyticsModel, PerformanceMetric, Screen as ScreenModel
+from database import session_scope
+from config_store import load_config, store_configs
+from screen_history import record_version
+from schemas import ScreenCreate
+
+# Сколько экранов читается из БД и пишется одним INSERT ... ON CONFLICT
+SCREEN_TRANSFER_BATCH_SIZE = int(os.getenv("SCREEN_TRANSFER_BATCH_SIZE", "200"))
+
+# Поля экрана, переносимые между окружениями, и их значения по умолчанию
+SCREEN_DEFAULTS = {
+    "title": "",
+    "description": "",
+    "config": {},
+    "platform": "web",
+    "locale": "ru",
+    "is_active": True,
+}
+SCREEN_EXPORT_FIELDS = ("name",) + tuple(SCREEN_DEFAULTS)
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# (источник, содержимое): имя файла или номер строки NDJSON и байты одного экрана
+Document = Tuple[str, bytes]
+
+
+class ScreenImportError(ValueError):
+    """Некорректный экран во входных данных; импорт откатывается целиком"""
+
+
+class ScreenRecord(ScreenCreate):
+    """Экран во входных данных импорта: те же проверки, что у POST /api/screens"""
+    is_active: bool = True
+
+
+def export_record(screen: ScreenModel) -> Dict[str, Any]:
+    return {field: getattr(screen, field) for field in SCREEN_EXPORT_FIELDS}
+
+
+def iter_screen_batches(db: Session, batch_size: int = SCREEN_TRANSFER_BATCH_SIZE) -> Iterator[List[ScreenModel]]:
+    """Экраны пачками по id; прочитанные объекты выгружаются из сессии"""
+    last_id = 0
+    while True:
+        screens = db.query(ScreenModel).filter(
+            ScreenModel.id > last_id
+        ).order_by(ScreenModel.id).limit(batch_size).all()
+        if not screens:
+            return
+        last_id = screens[-1].id
+        yield screens
+        db.expunge_all()
+
+
+def iter_ndjson_export(batch_size: int = SCREEN_TRANSFER_BATCH_SIZE) -> Iterator[bytes]:
+    with session_scope() as db:
+        for screens in iter_screen_batches(db, batch_size):
+            yield "".join(
+                json.dumps(export_record(screen), ensure_ascii=False) + "\n" for screen in screens
+            ).encode("utf-8")
+
+
+def iter_tar_export(batch_size: int = SCREEN_TRANSFER_BATCH_SIZE) -> Iterator[bytes]:
+    """tar.gz с файлом <name>.json на экран, в формате директории screens/"""
+    buffer = io.BytesIO()
+    with session_scope() as db:
+        with tarfile.open(fileobj=buffer, mode="w|gz") as archive:
+            for screens in iter_screen_batches(db, batch_size):
+                for screen in screens:
+                    data = json.dumps(export_record(screen), ensure_ascii=False, indent=2).encode("utf-8")
+                    info = tarfile.TarInfo(f"{screen.name.replace('/', '_')}.json")
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    archive.addfile(info, io.BytesIO(data))
+                chunk = _drain(buffer)
+                if chunk:
+                    yield chunk
+    yield _drain(buffer)
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def screen_row(data: Any, source: str, defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if not isinstance(data, dict) or not data.get("name"):
+        raise ScreenImportError(f"{source}: отсутствует 'name'")
+    defaults = {**SCREEN_DEFAULTS, **(defaults or {})}
+    row = {field: data.get(field, default) for field, default in defaults.items()}
+    row["name"] = data["name"]
+    try:
+        record = ScreenRecord.model_validate(row)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        raise ScreenImportError(f"{source}: {errors}") from e
+    return record.model_dump()
+
+
+def parse_screen_document(source: str, content: bytes, defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    try:
+        data = json.loads(content)
+    except ValueError as e:
+        raise ScreenImportError(f"{source}: {e}") from e
+    return screen_row(data, source, defaults)
+
+
+def iter_ndjson_documents(stream: IO[bytes]) -> Iterator[Document]:
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield f"line {number}", line
+
+
+def iter_tar_documents(stream: IO[bytes]) -> Iterator[Document]:
+    """Читает архив потоком: в памяти только текущий файл"""
+    with tarfile.open(fileobj=stream, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(".json"):
+                yield member.name, archive.extractfile(member).read()
+
+
+def iter_file_documents(paths: Iterable[Path]) -> Iterator[Document]:
+    for path in paths:
+        yield str(path), path.read_bytes()
+
+
+def iter_screen_rows(
+    documents: Iterable[Document],
+    batch_size: int = SCREEN_TRANSFER_BATCH_SIZE,
+    executor: Optional[Executor] = None,
+    defaults: Optional[Dict[str, Any]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """Разбирает документы пачками; при executor пачка разбирается параллельно"""
+    parse = partial(parse_screen_document, defaults=defaults)
+    documents = iter(documents)
+    while True:
+        batch = list(islice(documents, batch_size))
+        if not batch:
+            return
+        if executor is None:
+            yield [parse(source, content) for source, content in batch]
+        else:
+            sources, contents = zip(*batch)
+            yield list(executor.map(parse, sources, contents))
+
+
+class ScreenImport:
+    """Upsert экранов пачками в транзакции сессии; commit делает вызывающий.
+
+    После commit ``changes`` и ``routes`` передаются в инвалидацию кэша.
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+        self.changes: List[Tuple[int, Dict[str, Any]]] = []
+        self.routes: Set[Tuple[str, str, str]] = set()
+
+    def run(self, db: Session, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[int]:
+        """Импортирует пачки, после каждой отдает число обработанных экранов"""
+        for rows in batches:
+            self.upsert(db, rows)
+            yield self.processed
+
+    def upsert(self, db: Session, rows: List[Dict[str, Any]]):
+        # Одна строка не может обновиться дважды за INSERT: из повторов берем последний
+        rows = list({row["name"]: {**row, "version": 1} for row in rows}.values())
+        configs = {row["name"]: row["config"] for row in rows}
+        existing = db.query(
+            ScreenModel.name, ScreenModel.platform, ScreenModel.locale, ScreenModel.version, ScreenModel.config
+        ).filter(ScreenModel.name.in_(list(configs))).all()
+        # Старые маршруты: platform/locale могут измениться, их кэш разрешения тоже устаревает
+        self.routes.update((row.name, row.platform, row.locale) for row in existing)
+        previous = {row.name: row for row in existing}
+
+        for row, config in zip(rows, store_configs(db, list(configs.values()))):
+            row["config"] = config
+
+        dialect = db.get_bind().dialect.name
+        statement = _UPSERT_INSERTS[dialect](ScreenModel).values(rows)
+        stored_config, new_config = ScreenModel.config, statement.excluded.config
+        if dialect == "postgresql":
+            # У json нет оператора сравнения
+            stored_config, new_config = cast(stored_config, JSONB), cast(new_config, JSONB)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ScreenModel.name],
+            set_={
+                **{field: statement.excluded[field] for field in SCREEN_DEFAULTS},
+                # Версия - версия config: повторный импорт того же экрана ее не меняет
+                "version": case(
+                    (stored_config.is_distinct_from(new_config), ScreenModel.version + 1),
+                    else_=ScreenModel.version
+                ),
+                "updated_at": func.now(),
+            },
+        ).returning(
+            ScreenModel.id, ScreenModel.name, ScreenModel.platform, ScreenModel.locale,
+            ScreenModel.version, ScreenModel.is_active
+        )
+
+        for row in db.execute(statement).all():
+            screen = dict(row._mapping)
+            self.changes.append((screen["id"], screen))
+            self.routes.add((screen["name"], screen["platform"], screen["locale"]))
+            old = previous.get(screen["name"])
+            if old is None:
+                self.created += 1
+                continue
+            self.updated += 1
+            if screen["version"] != old.version:
+                record_version(
+                    db, screen["id"], screen["version"], configs[screen["name"]], load_config(db, old.config)
+                )
+        # История следующей пачки с тем же экраном должна видеть записанные версии
+        db.flush()
+        self.processed += len(rows)
+
+    def delete(self, db: Session, names: Iterable[str]):
+        """Удаляет экраны по именам (файл экрана удален из источника)"""
+        rows = db.query(
+            ScreenModel.id, ScreenModel.name, ScreenModel.platform, ScreenModel.locale
+        ).filter(ScreenModel.name.in_(list(names))).all()
+        if not rows:
+            return
+        screen_ids = [row.id for row in rows]
+        # У ссылок на экран нет ondelete: отвязываем их, как это делает удаление через ORM,
+        # иначе внешний ключ не даст удалить экран
+        for model in (AnalyticsModel, ABTestModel, PerformanceMetric):
+            db.query(model).filter(model.screen_id.in_(screen_ids)).update(
+                {model.screen_id: None}, synchronize_session=False
+            )
+        db.query(ScreenModel).filter(ScreenModel.id.in_(screen_ids)).delete(synchronize_session=False)
+        for row in rows:
+            self.changes.append((row.id, None))
+            self.routes.add((row.name, row.platform, row.locale))
+        self.deleted += len(rows)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "processed": self.processed, "created": self.created,
+            "updated": self.updated, "deleted": self.deleted,
+        }
+
+
+def import_screen_documents(
+    documents: Iterable[Document],
+    workers: int = 0,
+    batch_size: int = SCREEN_TRANSFER_BATCH_SIZE,
+    defaults: Optional[Dict[str, Any]] = None,
+    verbose: bool = True
+) -> ScreenImport:
+    """Импорт в одной транзакции: при любой ошибке не сохраняется ничего"""
+    result = ScreenImport()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        with session_scope() as db:
+            batches = iter_screen_rows(documents, batch_size, executor, defaults)
+            for processed in result.run(db, batches):
+                if verbose:
+                    print(f"⏳ Импортировано экранов: {processed}")
+            db.commit()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return result
+
+
+def iter_path_documents(path: Path) -> Iterator[Document]:
+    if path.is_dir():
+        yield from iter_file_documents(sorted(path.glob("*.json")))
+    elif path.suffix == ".ndjson":
+        with open(path, "rb") as stream:
+            yield from iter_ndjson_documents(stream)
+    elif path.suffix == ".json":
+        yield from iter_file_documents([path])
+    else:
+        with open(path, "rb") as stream:
+            yield from iter_tar_documents(stream)
+
+
+async def invalidate_after_import(result: ScreenImport):
+    """Инвалидация кэша из CLI, вне процесса приложения"""
+    # routers.screens импортирует этот модуль, поэтому импорт - при вызове
+    from routers.screens import invalidate_imported_screens
+    from cache import redis_client
+    try:
+        await invalidate_imported_screens(result)
+    finally:
+        await redis_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт и импорт экранов BDUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("-o", "--output", help="файл результата (по умолчанию stdout)")
+    export_parser.add_argument("--format", choices=("ndjson", "tar"), default="ndjson")
+
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("paths", nargs="+", type=Path)
+    import_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    import_parser.add_argument("--batch-size", type=int, default=SCREEN_TRANSFER_BATCH_SIZE)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        chunks = iter_ndjson_export() if args.format == "ndjson" else iter_tar_export()
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+        return
+
+    start_time = time.time()
+    documents = (document for path in args.paths for document in iter_path_documents(path))
+    try:
+        result = import_screen_documents(documents, args.workers, args.batch_size)
+    except ScreenImportError as e:
+        print(f"❌ Импорт отменен: {e}")
+        sys.exit(1)
+    asyncio.run(invalidate_after_import(result))
+    print(
+        f"🎉 Импорт завершен за {time.time() - start_time:.1f} с: "
+        f"создано {result.created}, обновлено {result.updated}"
+    )
+
+
+if __name__ == "__main__":
+    main()
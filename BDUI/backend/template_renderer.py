@@ -0,0 +1,108 @@
+"""
+Компиляция шаблонов экранов в план подстановки переменных {{var}}
+"""
+import copy
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+# Сколько скомпилированных шаблонов держать в памяти воркера
+TEMPLATE_PLAN_CACHE_SIZE = 128
+
+# Путь до строки в config и ее сегменты: четные - текст, нечетные - имена переменных
+Slot = Tuple[Tuple[Any, ...], Tuple[str, ...]]
+
+
+class TemplatePlan:
+    """Скомпилированный шаблон: хранит только места с переменными.
+
+    ``render`` копирует лишь контейнеры на пути к этим местам, остальные
+    поддеревья результата - общие с шаблоном, поэтому их нельзя изменять на месте.
+    """
+
+    __slots__ = ("config", "slots")
+
+    def __init__(self, config: Any, slots: List[Slot]):
+        self.config = config
+        self.slots = slots
+
+    def render(self, variables: Dict[str, Any]) -> Any:
+        if not self.slots:
+            return self.config
+        if not self.slots[0][0]:
+            # Весь config - одна строка с переменными
+            return _render_segments(self.slots[0][1], variables)
+
+        root = _shallow_copy(self.config)
+        copied = {(): root}
+        for path, segments in self.slots:
+            parent = root
+            for depth in range(1, len(path)):
+                prefix = path[:depth]
+                node = copied.get(prefix)
+                if node is None:
+                    node = _shallow_copy(parent[path[depth - 1]])
+                    parent[path[depth - 1]] = node
+                    copied[prefix] = node
+                parent = node
+            parent[path[-1]] = _render_segments(segments, variables)
+        return root
+
+
+def compile_template(config: Any) -> TemplatePlan:
+    slots: List[Slot] = []
+    _collect_slots(config, (), slots)
+    return TemplatePlan(config, slots)
+
+
+def _collect_slots(node: Any, path: Tuple[Any, ...], slots: List[Slot]):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            _collect_slots(value, path + (key,), slots)
+    elif isinstance(node, list):
+        for index, item in enumerate(node):
+            _collect_slots(item, path + (index,), slots)
+    elif isinstance(node, str) and "{{" in node:
+        segments = PLACEHOLDER_PATTERN.split(node)
+        if len(segments) > 1:
+            slots.append((path, tuple(segments)))
+
+
+def _render_segments(segments: Tuple[str, ...], variables: Dict[str, Any]) -> str:
+    parts = []
+    for index, segment in enumerate(segments):
+        if index % 2 == 0:
+            parts.append(segment)
+        elif segment in variables:
+            parts.append(str(variables[segment]))
+        else:
+            # Неизвестная переменная остается в тексте как есть
+            parts.append("{{" + segment + "}}")
+    return "".join(parts)
+
+
+def _shallow_copy(node: Any) -> Any:
+    return dict(node) if isinstance(node, dict) else list(node)
+
+
+_plans: "OrderedDict[Hashable, TemplatePlan]" = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def get_template_plan(cache_key: Hashable, config: Any) -> TemplatePlan:
+    """План шаблона из кэша воркера; cache_key - (id шаблона, updated_at)"""
+    with _plans_lock:
+        plan = _plans.get(cache_key)
+        if plan is not None:
+            _plans.move_to_end(cache_key)
+            return plan
+
+    # План хранит свою копию config: объект из сессии БД может измениться
+    plan = compile_template(copy.deepcopy(config))
+    with _plans_lock:
+        _plans[cache_key] = plan
+        while len(_plans) > TEMPLATE_PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
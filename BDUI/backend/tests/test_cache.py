@@ -0,0 +1,264 @@
+"""
+Tests for the layered Redis cache (cache.py) against fakeredis
+"""
+import asyncio
+import importlib.util
+import time
+from pathlib import Path
+import fakeredis
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def cache_module():
+    """Fresh copy of the real cache module; conftest replaces ``cache`` in sys.modules"""
+    spec = importlib.util.spec_from_file_location("real_cache", BACKEND_DIR / "cache.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.redis_client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    return module
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.unit
+class TestLocalCache:
+    """Test the in-process L1 cache"""
+
+    def test_lru_eviction_and_ttl(self, cache_module):
+        """Test that the least recently used entry is evicted and entries expire"""
+        local = cache_module.LocalCache(max_entries=2, ttl=60)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+
+        assert local.get("b") is None
+        assert local.get("a") == 1 and local.get("c") == 3
+
+        local.set("short", 4, ttl=0)
+        assert local.get("short") is None
+
+
+@pytest.mark.unit
+class TestCacheStorage:
+    """Test key generations and the stored value format"""
+
+    async def test_namespace_invalidation_bumps_generation(self, cache_module):
+        """Test that invalidating a namespace is one INCR and hides old entries"""
+        cache = cache_module.Cache()
+        await cache.set("screens:1", {"id": 1})
+        assert await cache_module.redis_client.exists("screens:v0:1")
+
+        await cache.invalidate_namespace("screens")
+
+        assert await cache.get("screens:1") is None
+        assert int(await cache_module.redis_client.get("cache_gen:screens")) == 1
+        await cache.set("screens:1", {"id": 1, "version": 2})
+        assert await cache.get("screens:1") == {"id": 1, "version": 2}
+
+    async def test_set_many_records_write_metrics(self, cache_module):
+        """Test that a pipelined write is counted in each namespace it touches"""
+        cache = cache_module.Cache()
+        await cache.set_many({"resolved_screen:1:control": b"a", "resolved_screen:2:control": b"b", "ab_assignment:1": {}})
+
+        assert cache.metrics.namespace("resolved_screen").set_latency.count == 1
+        assert cache.metrics.namespace("ab_assignment").set_latency.count == 1
+        assert await cache.get_many(["resolved_screen:2:control", "ab_assignment:1"]) == {
+            "resolved_screen:2:control": b"b", "ab_assignment:1": {}
+        }
+
+    def test_value_headers_and_compression(self, cache_module):
+        """Test the self-describing encoding of JSON, raw bytes and compressed values"""
+        assert cache_module._encode({"a": 1}) == b'{"a":1}'
+        assert cache_module._encode(b"body") == b"\x01body"
+
+        large = {"components": [{"id": i, "type": "Card"} for i in range(500)]}
+        data = cache_module._encode(large)
+        assert data[:1] == b"\x02"
+        assert cache_module._decode(data) == large
+
+        raw = b"x" * 10000
+        data = cache_module._encode(raw)
+        assert data[:1] == b"\x02" and len(data) < len(raw)
+        assert cache_module._decode(data) == raw
+
+
+@pytest.mark.unit
+class TestCacheInvalidation:
+    """Test pub/sub invalidation of other workers' L1"""
+
+    async def test_delete_reaches_other_worker(self, cache_module):
+        """Test that a delete in one worker drops the entry from another worker's L1"""
+        writer = cache_module.Cache(cache_module.LocalCache(100, 60))
+        reader = cache_module.Cache(cache_module.LocalCache(100, 60))
+        reader.start_invalidation_listener()
+        try:
+            await asyncio.sleep(0.1)
+            await writer.set("screen:1", {"version": 1})
+            assert await reader.get("screen:1") == {"version": 1}
+            assert len(reader.local) == 1
+
+            await writer.delete("screen:1")
+            await wait_for(lambda: len(reader.local) == 0)
+            assert await reader.get("screen:1") is None
+        finally:
+            await reader.stop_invalidation_listener()
+
+
+@pytest.mark.unit
+class TestGetOrCompute:
+    """Test single-flight computation and stale-while-revalidate"""
+
+    async def test_single_flight_within_and_across_workers(self, cache_module):
+        """Test that concurrent misses in two workers run the loader once"""
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"value": 42}
+
+        workers = [cache_module.Cache(), cache_module.Cache()]
+        results = await asyncio.gather(*[
+            workers[i % 2].get_or_compute("stats:overview", loader) for i in range(10)
+        ])
+
+        assert len(calls) == 1
+        assert all(result == {"value": 42} for result in results)
+
+    async def test_waiter_does_not_stall_when_holder_fails(self, cache_module):
+        """Test that a failed loader in the lock holder does not make waiters sleep out the lock TTL"""
+        async def failing_loader():
+            await asyncio.sleep(0.05)
+            raise ValueError("Screen not found")
+
+        async def loader():
+            return {"value": 1}
+
+        holder, waiter = cache_module.Cache(), cache_module.Cache()
+        holder_call = asyncio.ensure_future(holder.get_or_compute("screen:404", failing_loader))
+        await asyncio.sleep(0.01)
+        started = asyncio.get_running_loop().time()
+
+        assert await waiter.get_or_compute("screen:404", loader) == {"value": 1}
+        assert asyncio.get_running_loop().time() - started < 1
+        with pytest.raises(ValueError):
+            await holder_call
+
+    async def test_sync_loader_does_not_block_event_loop(self, cache_module):
+        """Test that a blocking loader runs in a thread while other coroutines proceed"""
+        ticks = []
+
+        async def ticker():
+            for _ in range(10):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        def loader():
+            time.sleep(0.2)
+            return {"ticks": len(ticks)}
+
+        cache = cache_module.Cache()
+        result, _ = await asyncio.gather(cache.get_or_compute("stats:1", loader), ticker())
+
+        assert result == {"ticks": 10}
+
+    async def test_soft_invalidation_serves_stale_and_refreshes(self, cache_module):
+        """Test that a touched entry is served stale while one background refresh runs"""
+        cache = cache_module.Cache()
+        versions = iter(range(1, 10))
+
+        def loader():
+            return {"version": next(versions)}
+
+        assert await cache.get_or_compute("analytics:1", loader, ttl=60, soft_ttl=60) == {"version": 1}
+        await asyncio.sleep(0.05)
+        await cache.invalidate_namespace("analytics", soft=True)
+
+        assert await cache.get_or_compute("analytics:1", loader, ttl=60, soft_ttl=60) == {"version": 1}
+        await asyncio.gather(*cache._background)
+        assert await cache.get("analytics:1") == {"version": 2}
+
+    async def test_l1_entry_expires_with_soft_ttl(self, cache_module):
+        """Test that L1 does not keep serving a computed value after its soft TTL"""
+        cache = cache_module.Cache(cache_module.LocalCache(100, 60))
+        versions = iter(range(1, 10))
+
+        def loader():
+            return {"version": next(versions)}
+
+        assert await cache.get_or_compute("analytics:1", loader, ttl=60, soft_ttl=0.2) == {"version": 1}
+        await asyncio.sleep(0.3)
+
+        assert await cache.get_or_compute("analytics:1", loader, ttl=60, soft_ttl=0.2) == {"version": 1}
+        assert len(cache._background) == 1
+        await asyncio.gather(*cache._background)
+        assert await cache.get("analytics:1") == {"version": 2}
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    """Test skipping Redis while it is unavailable"""
+
+    async def test_breaker_opens_and_recovers(self, cache_module):
+        """Test that repeated failures open the breaker and a successful probe closes it"""
+        server = fakeredis.FakeServer()
+        server.connected = False
+        cache_module.redis_client = fakeredis.FakeAsyncRedis(server=server)
+        breaker = cache_module.circuit_breaker = cache_module.CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        cache = cache_module.Cache()
+
+        assert await cache.get("plain") is None
+        assert await cache.get("plain") is None
+        assert breaker.state == breaker.OPEN
+
+        assert await cache.get("plain") is None
+        assert breaker.rejected_calls == 1
+
+        server.connected = True
+        await asyncio.sleep(0.06)
+        assert breaker.state == breaker.HALF_OPEN
+        await cache.set("plain", 1)
+        assert breaker.state == breaker.CLOSED
+        assert await cache.get("plain") == 1
+
+    async def test_pattern_invalidation_goes_through_breaker(self, cache_module):
+        """Test that SCAN-based invalidation deletes matches and is skipped while the breaker is open"""
+        redis_client = cache_module.redis_client
+        await redis_client.set("legacy:a:1", 1)
+        await redis_client.set("legacy:b:1", 1)
+        await redis_client.set("other", 1)
+        cache = cache_module.Cache()
+
+        await cache.invalidate_pattern("*:a:*")
+        assert await redis_client.exists("legacy:a:1", "legacy:b:1", "other") == 2
+
+        breaker = cache_module.circuit_breaker = cache_module.CircuitBreaker(failure_threshold=1, cooldown=60)
+        breaker.record_failure()
+        await cache.invalidate_pattern("*:b:*")
+        assert await redis_client.exists("legacy:b:1")
+        assert breaker.rejected_calls >= 1
+
+
+@pytest.mark.unit
+class TestCachedJSON:
+    """Test cached response bodies on top of the real cache"""
+
+    async def test_value_in_old_format_is_recomputed(self, cache_module, monkeypatch):
+        """Test that a plain JSON value left by an older release is treated as a miss"""
+        import response_cache
+        monkeypatch.setattr(response_cache, "cache", cache_module.Cache())
+        await cache_module.redis_client.set("legacy_categories", b'["basic", "layout"]')
+
+        entry = await response_cache.get_or_compute_json("legacy_categories", lambda: ["basic"])
+
+        assert entry.body == b'["basic"]'
+        assert response_cache.unpack_json(cache_module._decode(await cache_module.redis_client.get("legacy_categories"))) == entry
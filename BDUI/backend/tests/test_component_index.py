@@ -0,0 +1,37 @@
+"""
+Tests for the component id -> JSON pointer index of screen configs
+"""
+import pytest
+from component_index import build_component_index
+from json_patch import resolve_pointer
+
+
+@pytest.mark.unit
+class TestComponentIndex:
+    """Test building the component index"""
+
+    def test_index_points_to_nested_components(self):
+        """Test that every component, including nested ones, resolves by its pointer"""
+        config = {
+            "components": [
+                {"id": "banner", "type": "Banner", "props": {"id": "not-a-component"}},
+                {"id": "list", "type": "List", "children": [{"id": "card/1", "type": "Card"}]},
+            ],
+        }
+
+        index = build_component_index(config)
+
+        assert index == {
+            "banner": "/components/0",
+            "list": "/components/1",
+            "card/1": "/components/1/children/0",
+        }
+        for component_id, pointer in index.items():
+            assert resolve_pointer(config, pointer)["id"] == component_id
+
+    def test_duplicate_ids_keep_first(self):
+        """Test that a repeated id points to the first component in document order"""
+        config = {"components": [{"id": "a", "type": "Text"}, {"id": "a", "type": "Image"}]}
+
+        assert build_component_index(config) == {"a": "/components/0"}
+        assert build_component_index({}) == {}
@@ -0,0 +1,71 @@
+"""
+Tests for the content-addressed representation of screen and template configs
+"""
+import pytest
+from config_blobs import AssembledBlobCache, ConfigBlobMissingError, assemble_config, ref_digest, split_config
+
+
+def make_config(title):
+    return {
+        "header": {"title": title},
+        "components": [{"id": f"card_{i}", "type": "Card", "props": {"text": "x" * 40}} for i in range(10)],
+    }
+
+
+def make_fetcher(blobs, calls):
+    def fetch(digests):
+        calls.append(list(digests))
+        return {digest: blobs[digest] for digest in digests if digest in blobs}
+    return fetch
+
+
+@pytest.mark.unit
+class TestConfigBlobs:
+    """Test splitting configs into shared blobs and assembling them back"""
+
+    def test_shared_subtrees_are_stored_once(self):
+        """Test that configs differing in one field share the unchanged subtree blob"""
+        root_ru, blobs_ru, _ = split_config(make_config("Привет"), min_bytes=64)
+        root_en, blobs_en, _ = split_config(make_config("Hello"), min_bytes=64)
+
+        assert ref_digest(root_ru) != ref_digest(root_en)
+        shared = blobs_ru.keys() & blobs_en.keys()
+        assert len(shared) == len(blobs_ru) - 1
+        assert sum(len(data) for data in blobs_ru.values()) > 3 * len(blobs_en[ref_digest(root_en)])
+
+    def test_assemble_round_trip_through_cache(self):
+        """Test that assembly restores the config and reuses cached subtrees"""
+        config = make_config("Привет")
+        root, blobs, _ = split_config(config, min_bytes=64)
+        cache = AssembledBlobCache()
+        calls = []
+
+        assert assemble_config(root, make_fetcher(blobs, calls), cache) == config
+        assert 0 < len(calls) <= 3
+        calls.clear()
+        assert assemble_config(root, make_fetcher(blobs, calls), cache) == config
+        assert calls == []
+
+        other_root, other_blobs, _ = split_config(make_config("Hello"), min_bytes=64)
+        assert assemble_config(other_root, make_fetcher(other_blobs, calls), cache) == make_config("Hello")
+        assert calls == [[ref_digest(other_root)]]
+
+    def test_plain_and_missing_values(self):
+        """Test that inline configs pass through and dangling references fail loudly"""
+        config = {"layout": "list"}
+        assert assemble_config(config, make_fetcher({}, [])) is config
+        assert assemble_config(None, make_fetcher({}, [])) is None
+
+        with pytest.raises(ConfigBlobMissingError):
+            assemble_config({"$blob": "0" * 64}, make_fetcher({}, []), AssembledBlobCache())
+
+    def test_cache_is_bounded_by_size(self):
+        """Test that least recently used subtrees are evicted first"""
+        cache = AssembledBlobCache(max_bytes=10)
+        cache.put_many({"a": b"12345", "b": b"12345"})
+        cache.get("a")
+        cache.put_many({"c": b"123"})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"12345" and cache.get("c") == b"123"
+        assert cache.size == 8
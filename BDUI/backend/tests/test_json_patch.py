@@ -0,0 +1,121 @@
+"""
+Tests for JSON Patch (RFC 6902) application to screen configs
+"""
+import pytest
+from json_patch import apply_patch, make_patch, parse_pointer, JsonPatchError
+
+
+@pytest.fixture
+def config():
+    return {
+        "components": [
+            {"id": "header", "type": "Text", "props": {"text": "Hello"}},
+            {"id": "button", "type": "Button", "props": {"label": "Buy"}},
+        ],
+        "settings": {"a/b": 1, "m~n": 2},
+    }
+
+
+@pytest.mark.unit
+class TestJsonPatch:
+    """Test JSON Patch operations"""
+
+    def test_parse_pointer_unescapes_tokens(self):
+        """Test ~1 and ~0 escapes in JSON pointers"""
+        assert parse_pointer("") == []
+        assert parse_pointer("/settings/a~1b") == ["settings", "a/b"]
+        assert parse_pointer("/settings/m~0n") == ["settings", "m~n"]
+
+        with pytest.raises(JsonPatchError):
+            parse_pointer("settings")
+
+    def test_add_replace_remove(self, config):
+        """Test basic operations on objects and arrays"""
+        result = apply_patch(config, [
+            {"op": "replace", "path": "/components/0/props/text", "value": "Hi"},
+            {"op": "add", "path": "/components/-", "value": {"id": "footer"}},
+            {"op": "add", "path": "/components/0", "value": {"id": "banner"}},
+            {"op": "remove", "path": "/settings/m~0n"},
+        ])
+
+        assert [c["id"] for c in result["components"]] == ["banner", "header", "button", "footer"]
+        assert result["components"][1]["props"]["text"] == "Hi"
+        assert result["settings"] == {"a/b": 1}
+
+    def test_move_and_copy(self, config):
+        """Test move and copy between locations"""
+        result = apply_patch(config, [
+            {"op": "move", "from": "/components/1", "path": "/components/0"},
+            {"op": "copy", "from": "/components/1/props", "path": "/settings/header_props"},
+        ])
+
+        assert [c["id"] for c in result["components"]] == ["button", "header"]
+        assert result["settings"]["header_props"] == {"text": "Hello"}
+        assert result["settings"]["header_props"] is not result["components"][1]["props"]
+
+    def test_move_into_own_child_fails(self, config):
+        """Test that a location cannot be moved into its own child"""
+        with pytest.raises(JsonPatchError):
+            apply_patch(config, [{"op": "move", "from": "/settings", "path": "/settings/inner"}])
+
+    def test_test_operation(self, config):
+        """Test that the test operation compares JSON values strictly"""
+        apply_patch(config, [{"op": "test", "path": "/settings/a~1b", "value": 1}])
+
+        with pytest.raises(JsonPatchError):
+            apply_patch(config, [{"op": "test", "path": "/settings/a~1b", "value": True}])
+
+    def test_patch_is_atomic(self, config):
+        """Test that a failing patch leaves the document unchanged"""
+        original = {"components": list(config["components"]), "settings": dict(config["settings"])}
+
+        with pytest.raises(JsonPatchError):
+            apply_patch(config, [
+                {"op": "remove", "path": "/components/0"},
+                {"op": "replace", "path": "/missing", "value": 1},
+            ])
+
+        assert config == original
+
+    @pytest.mark.parametrize("operation", [
+        {"op": "add", "path": "/components/5", "value": {}},
+        {"op": "remove", "path": "/components/01"},
+        {"op": "replace", "path": "/components/0/props/missing", "value": 1},
+        {"op": "add", "path": "/settings"},
+        {"op": "unknown", "path": "/settings"},
+    ])
+    def test_invalid_operations(self, config, operation):
+        """Test that invalid operations are rejected"""
+        with pytest.raises(JsonPatchError):
+            apply_patch(config, [operation])
+
+
+@pytest.mark.unit
+class TestMakePatch:
+    """Test structural diff between configs"""
+
+    def test_identical_documents(self, config):
+        """Test that equal documents produce an empty patch"""
+        assert make_patch(config, config) == []
+
+    def test_patch_round_trip(self, config):
+        """Test that applying the diff reproduces the target"""
+        target = {
+            "components": [
+                {"id": "header", "type": "Text", "props": {"text": "Hi"}},
+                {"id": "banner", "type": "Image"},
+                {"id": "button", "type": "Button", "props": {"label": "Buy"}},
+            ],
+            "settings": {"a/b": True},
+        }
+
+        patch = make_patch(config, target)
+
+        assert apply_patch(config, patch) == target
+        assert make_patch(apply_patch(config, patch), target) == []
+
+    def test_insert_in_list_is_local(self, config):
+        """Test that inserting a component does not rewrite its neighbours"""
+        target = {**config, "components": [config["components"][0], {"id": "new"}, config["components"][1]]}
+
+        assert make_patch(config, target) == [{"op": "add", "path": "/components/1", "value": {"id": "new"}}]
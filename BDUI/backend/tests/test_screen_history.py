@@ -0,0 +1,89 @@
+"""
+Tests for the snapshot + delta history of screen configs
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import screen_history
+from models import Base, Screen as ScreenModel, ScreenVersion
+from screen_history import get_version_config, list_versions, record_version
+
+
+def make_config(version):
+    return {
+        "header": {"title": f"Version {version}"},
+        "components": [{"id": f"card_{i}", "type": "Card"} for i in range(version)],
+    }
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add(ScreenModel(id=1, name="home", title="Home", config=make_config(1)))
+    session.flush()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def record_versions(db, versions):
+    for version in versions:
+        record_version(db, 1, version, make_config(version), make_config(version - 1) if version > 1 else None)
+        db.flush()
+
+
+@pytest.mark.unit
+class TestScreenHistory:
+    """Test recording versions and reconstructing their configs"""
+
+    def test_snapshots_are_written_every_interval(self, db, monkeypatch):
+        """Test that a full snapshot starts each interval and deltas fill the gaps"""
+        monkeypatch.setattr(screen_history, "SCREEN_SNAPSHOT_INTERVAL", 3)
+        record_versions(db, range(1, 8))
+
+        snapshots = [row["version"] for row in list_versions(db, 1) if row["is_snapshot"]]
+        assert snapshots == [1, 4, 7]
+
+    def test_reconstruction_across_snapshot_boundary(self, db, monkeypatch):
+        """Test that every version is restored from its nearest snapshot plus deltas"""
+        monkeypatch.setattr(screen_history, "SCREEN_SNAPSHOT_INTERVAL", 3)
+        record_versions(db, range(1, 8))
+
+        for version in range(1, 8):
+            assert get_version_config(db, 1, version) == make_config(version)
+        assert get_version_config(db, 1, 8) is None
+
+    def test_reconstruction_does_not_mutate_snapshot(self, db, monkeypatch):
+        """Test that applying deltas leaves the stored snapshot intact"""
+        monkeypatch.setattr(screen_history, "SCREEN_SNAPSHOT_INTERVAL", 10)
+        record_versions(db, range(1, 4))
+
+        assert get_version_config(db, 1, 3) == make_config(3)
+        assert get_version_config(db, 1, 1) == make_config(1)
+
+    def test_history_started_late_begins_with_snapshot(self, db):
+        """Test that the first recorded change snapshots the previous config and deltas from it"""
+        record_version(db, 1, 5, make_config(5), make_config(4))
+        db.flush()
+
+        assert [(row["version"], row["is_snapshot"]) for row in list_versions(db, 1)] == [(4, True), (5, False)]
+        assert get_version_config(db, 1, 4) == make_config(4)
+        assert get_version_config(db, 1, 3) is None
+
+    def test_repeated_version_is_ignored(self, db):
+        """Test that recording an already stored version adds nothing"""
+        record_versions(db, [1, 2])
+        record_version(db, 1, 2, make_config(9), make_config(1))
+        db.flush()
+
+        assert db.query(ScreenVersion).count() == 2
+        assert get_version_config(db, 1, 2) == make_config(2)
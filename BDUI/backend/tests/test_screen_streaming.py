@@ -0,0 +1,71 @@
+"""
+Tests for progressive screen delivery (NDJSON stream and continuation cursor)
+"""
+import json
+import pytest
+from fastapi import HTTPException
+from screen_streaming import iter_screen_ndjson, cursor_screen_payload, components_page
+
+
+@pytest.fixture
+def screen():
+    return {
+        "id": 1,
+        "name": "catalog",
+        "version": 3,
+        "config": {
+            "layout": "list",
+            "components": [{"id": f"card_{i}", "type": "Card"} for i in range(12)],
+        },
+    }
+
+
+@pytest.mark.unit
+class TestScreenStreaming:
+    """Test splitting screens into header and component chunks"""
+
+    def test_ndjson_stream_reassembles_config(self, screen):
+        """Test that header plus chunks add up to the stored config"""
+        lines = [json.loads(line) for line in iter_screen_ndjson(screen, first=3, chunk_size=5)]
+
+        assert [line["type"] for line in lines] == ["header", "components", "components", "end"]
+        header = lines[0]
+        assert header["components_total"] == 12
+        assert header["screen"]["config"]["layout"] == "list"
+        assert [line["offset"] for line in lines[1:3]] == [3, 8]
+
+        components = header["screen"]["config"]["components"]
+        for line in lines[1:3]:
+            components += line["components"]
+        assert components == screen["config"]["components"]
+        assert lines[-1] == {"type": "end", "version": 3}
+
+    def test_cursor_pages_cover_all_components(self, screen):
+        """Test paging through components with the continuation cursor"""
+        payload = cursor_screen_payload(screen, first=4)
+        components = payload["config"]["components"]
+        cursor = payload["continuation"]["cursor"]
+
+        while cursor:
+            page = components_page(screen, cursor, limit=5)
+            components += page["components"]
+            cursor = page["next_cursor"]
+
+        assert components == screen["config"]["components"]
+
+    def test_small_screen_has_no_continuation(self, screen):
+        """Test that screens fitting into the header need no cursor"""
+        assert cursor_screen_payload(screen, first=20)["continuation"] is None
+        assert cursor_screen_payload({"id": 2, "version": 1, "config": {}}, first=2)["continuation"] is None
+
+    def test_cursor_rejected_after_screen_change(self, screen):
+        """Test that parts of different versions are not mixed"""
+        cursor = cursor_screen_payload(screen, first=4)["continuation"]["cursor"]
+
+        with pytest.raises(HTTPException) as exc_info:
+            components_page({**screen, "version": 4}, cursor, limit=5)
+        assert exc_info.value.status_code == 409
+
+        with pytest.raises(HTTPException) as exc_info:
+            components_page(screen, "not-a-cursor", limit=5)
+        assert exc_info.value.status_code == 400
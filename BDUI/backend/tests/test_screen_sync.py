@@ -0,0 +1,149 @@
+"""
+Tests for syncing screens with a directory of JSON files
+"""
+import json
+import os
+from contextlib import contextmanager
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import load_screens_from_json
+from load_screens_from_json import load_manifest, sync_screens
+from models import Analytics as AnalyticsModel, Base, PerformanceMetric, Screen as ScreenModel
+from screen_transfer import ScreenImport
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def enable_foreign_keys(connection, record):
+        connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    @contextmanager
+    def session_scope():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(load_screens_from_json, "session_scope", session_scope)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def screens_dir(tmp_path):
+    for name in ("home", "news"):
+        write_screen(tmp_path, name)
+    return tmp_path
+
+
+def write_screen(directory, name, title="Screen"):
+    data = {"name": name, "title": title, "config": {"components": [{"id": "title", "type": "Text"}]}}
+    (directory / f"{name}.json").write_text(json.dumps(data))
+
+
+def screen_titles(factory):
+    db = factory()
+    try:
+        return {screen.name: screen.title for screen in db.query(ScreenModel)}
+    finally:
+        db.close()
+
+
+@pytest.mark.unit
+class TestScreenSync:
+    """Test incremental sync and isolation of failing files"""
+
+    def test_delete_detaches_dependent_rows(self, session_factory, screens_dir):
+        """Test that a screen with analytics and metrics can be removed by deleting its file"""
+        manifest_path = screens_dir / ".sync_manifest.json"
+        sync_screens(screens_dir, manifest_path)
+        db = session_factory()
+        home_id = db.query(ScreenModel.id).filter_by(name="home").scalar()
+        db.add(AnalyticsModel(screen_id=home_id, event_type="view"))
+        db.add(PerformanceMetric(screen_id=home_id, operation_type="update", total_time=1.0))
+        db.commit()
+
+        (screens_dir / "home.json").unlink()
+        result = sync_screens(screens_dir, manifest_path)
+
+        assert result.deleted == 1
+        assert screen_titles(session_factory) == {"news": "Screen"}
+        assert [row.screen_id for row in db.query(AnalyticsModel.screen_id)] == [None]
+        assert [row.screen_id for row in db.query(PerformanceMetric.screen_id)] == [None]
+        assert set(load_manifest(manifest_path)) == {"news.json"}
+        db.close()
+
+    def test_invalid_file_does_not_block_others(self, session_factory, screens_dir):
+        """Test that a broken file is skipped and retried while other files are applied"""
+        manifest_path = screens_dir / ".sync_manifest.json"
+        sync_screens(screens_dir, manifest_path)
+        previous_entry = load_manifest(manifest_path)["home.json"]
+
+        (screens_dir / "home.json").write_text('{"name": "home", "config": ')
+        write_screen(screens_dir, "news", title="Updated")
+        write_screen(screens_dir, "promo")
+        result = sync_screens(screens_dir, manifest_path)
+
+        assert (result.created, result.updated) == (1, 1)
+        assert screen_titles(session_factory) == {"home": "Screen", "news": "Updated", "promo": "Screen"}
+        assert load_manifest(manifest_path)["home.json"] == previous_entry
+
+        write_screen(screens_dir, "home", title="Fixed")
+        sync_screens(screens_dir, manifest_path)
+        assert screen_titles(session_factory)["home"] == "Fixed"
+
+    def test_failed_delete_is_retried(self, session_factory, screens_dir, monkeypatch):
+        """Test that a failing delete keeps its manifest entry without rolling back other changes"""
+        manifest_path = screens_dir / ".sync_manifest.json"
+        sync_screens(screens_dir, manifest_path)
+        delete = ScreenImport.delete
+
+        def failing_delete(self, db, names):
+            if "home" in names:
+                raise RuntimeError("foreign key violation")
+            delete(self, db, names)
+
+        monkeypatch.setattr(ScreenImport, "delete", failing_delete)
+        (screens_dir / "home.json").unlink()
+        write_screen(screens_dir, "news", title="Updated")
+        sync_screens(screens_dir, manifest_path)
+
+        assert screen_titles(session_factory) == {"home": "Screen", "news": "Updated"}
+        assert set(load_manifest(manifest_path)) == {"home.json", "news.json"}
+
+        monkeypatch.setattr(ScreenImport, "delete", delete)
+        assert sync_screens(screens_dir, manifest_path).deleted == 1
+        assert set(load_manifest(manifest_path)) == {"news.json"}
+
+    def test_failed_rename_keeps_old_screen(self, session_factory, screens_dir, monkeypatch):
+        """Test that a file renaming its screen keeps the old screen when the new one cannot be written"""
+        manifest_path = screens_dir / ".sync_manifest.json"
+        sync_screens(screens_dir, manifest_path)
+        previous_entry = load_manifest(manifest_path)["home.json"]
+        upsert = ScreenImport.upsert
+
+        def failing_upsert(self, db, rows):
+            if any(row["name"] == "start" for row in rows):
+                raise RuntimeError("value too long")
+            upsert(self, db, rows)
+
+        monkeypatch.setattr(ScreenImport, "upsert", failing_upsert)
+        data = json.loads((screens_dir / "home.json").read_text())
+        (screens_dir / "home.json").write_text(json.dumps({**data, "name": "start"}))
+        result = sync_screens(screens_dir, manifest_path)
+
+        assert result.deleted == 0
+        assert screen_titles(session_factory) == {"home": "Screen", "news": "Screen"}
+        assert load_manifest(manifest_path)["home.json"] == previous_entry
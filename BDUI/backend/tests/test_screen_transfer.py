@@ -0,0 +1,97 @@
+"""
+Tests for importing screens from NDJSON and JSON documents
+"""
+import json
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Base, Screen as ScreenModel
+from screen_history import get_version_config, list_versions
+from screen_transfer import ScreenImport, ScreenImportError, parse_screen_document
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def screen_document(name, title="Home", components=1, **fields):
+    config = {"components": [{"id": f"card_{i}", "type": "Card"} for i in range(components)]}
+    return json.dumps({"name": name, "title": title, "config": config, **fields}).encode()
+
+
+def import_documents(db, *documents):
+    result = ScreenImport()
+    rows = [parse_screen_document(f"line {number}", content) for number, content in enumerate(documents, 1)]
+    for _ in result.run(db, [rows]):
+        pass
+    db.commit()
+    return result
+
+
+@pytest.mark.unit
+class TestScreenRows:
+    """Test validation of imported screen documents"""
+
+    def test_defaults_are_applied(self):
+        """Test that missing optional fields get their defaults"""
+        row = parse_screen_document("home.json", b'{"name": "home", "config": {}}')
+
+        assert row == {
+            "name": "home", "title": "", "description": "", "config": {},
+            "platform": "web", "locale": "ru", "is_active": True,
+        }
+
+    @pytest.mark.parametrize("content", [
+        b'{"title": "No name"}',
+        b'{"name": "home", "config": [1, 2]}',
+        b'{"name": "home", "config": {}, "title": 5}',
+        b'{"name": "home", "config": {}, "is_active": "maybe"}',
+        b'[1, 2]',
+        b'{"name": ',
+    ])
+    def test_invalid_documents_are_import_errors(self, content):
+        """Test that malformed screens are reported with their source"""
+        with pytest.raises(ScreenImportError, match="^home.json: "):
+            parse_screen_document("home.json", content)
+
+
+@pytest.mark.unit
+class TestScreenImport:
+    """Test upserting screens and their version history"""
+
+    def test_reimport_without_changes_keeps_version(self, db):
+        """Test that importing the same config again does not bump the version"""
+        assert import_documents(db, screen_document("home")).summary()["created"] == 1
+
+        result = import_documents(db, screen_document("home", title="Renamed"))
+
+        screen = db.query(ScreenModel).filter_by(name="home").one()
+        assert (result.created, result.updated) == (0, 1)
+        assert (screen.version, screen.title) == (1, "Renamed")
+        assert list_versions(db, screen.id) == []
+
+    def test_config_change_bumps_version_and_records_history(self, db):
+        """Test that each config change adds a version restorable from history"""
+        import_documents(db, screen_document("home", components=1), screen_document("news"))
+        import_documents(db, screen_document("home", components=2), screen_document("news"))
+        import_documents(db, screen_document("home", components=3))
+
+        home = db.query(ScreenModel).filter_by(name="home").one()
+        news = db.query(ScreenModel).filter_by(name="news").one()
+        assert (home.version, news.version) == (3, 1)
+        assert [row["version"] for row in list_versions(db, home.id)] == [1, 2, 3]
+        assert get_version_config(db, home.id, 1) == json.loads(screen_document("home", components=1))["config"]
+        assert get_version_config(db, home.id, 2) == json.loads(screen_document("home", components=2))["config"]
@@ -0,0 +1,57 @@
+"""
+Tests for compiled template rendering
+"""
+import pytest
+from template_renderer import compile_template, get_template_plan
+
+
+@pytest.fixture
+def template_config():
+    return {
+        "components": [
+            {"id": "title", "type": "Text", "props": {"text": "Объявления в {{city}}"}},
+            {"id": "static", "type": "Text", "props": {"text": "Без переменных"}},
+        ],
+        "meta": {"category": "{{category}}", "count": 10},
+    }
+
+
+@pytest.mark.unit
+class TestTemplateRenderer:
+    """Test template compilation and rendering"""
+
+    def test_render_substitutes_variables(self, template_config):
+        """Test substitution, including missing and non-string variables"""
+        result = compile_template(template_config).render({"city": "Москва", "category": 42})
+
+        assert result["components"][0]["props"]["text"] == "Объявления в Москва"
+        assert result["meta"] == {"category": "42", "count": 10}
+
+        result = compile_template(template_config).render({})
+        assert result["components"][0]["props"]["text"] == "Объявления в {{city}}"
+
+    def test_plan_records_only_slots(self, template_config):
+        """Test that the plan keeps only strings with placeholders"""
+        plan = compile_template(template_config)
+
+        assert [path for path, _ in plan.slots] == [
+            ("components", 0, "props", "text"),
+            ("meta", "category"),
+        ]
+
+    def test_render_shares_unchanged_subtrees(self, template_config):
+        """Test that untouched subtrees are shared and the template is not modified"""
+        plan = compile_template(template_config)
+
+        result = plan.render({"city": "Казань", "category": "auto"})
+
+        assert result["components"][1] is template_config["components"][1]
+        assert result["components"][0] is not template_config["components"][0]
+        assert template_config["components"][0]["props"]["text"] == "Объявления в {{city}}"
+
+    def test_plan_cache_by_template_version(self, template_config):
+        """Test that plans are cached per (template id, updated_at)"""
+        plan = get_template_plan(("test", 1), template_config)
+
+        assert get_template_plan(("test", 1), template_config) is plan
+        assert get_template_plan(("test", 2), template_config) is not plan